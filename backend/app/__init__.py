@@ -1,10 +1,19 @@
 from flask import Flask
 from flask_cors import CORS
+from werkzeug.middleware.proxy_fix import ProxyFix
 from config import config
+from app.utils.json_provider import OrjsonProvider
 
 def create_app(config_name='development'):
     app = Flask(__name__)
     app.config.from_object(config[config_name])
+    app.json = OrjsonProvider(app)
+
+    # Resolve request.remote_addr to the client address the proxy saw, so the rate
+    # limiter and audit logs key on the real client rather than the proxy
+    hops = app.config.get('PROXY_FIX_HOPS', 0)
+    if hops:
+        app.wsgi_app = ProxyFix(app.wsgi_app, x_for=hops, x_proto=hops)
     
     # Enable CORS
     CORS(app, resources={
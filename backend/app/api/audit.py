@@ -4,9 +4,37 @@ API endpoints for audit logs
 from flask import Blueprint, request, jsonify
 from app.utils.supabase_client import get_supabase_admin_client
 from datetime import datetime, timedelta
+from functools import lru_cache
+import heapq
 
 audit_bp = Blueprint('audit', __name__)
 
+
+@lru_cache(maxsize=256)
+def _display_action(name):
+    """Turn an event/action code like 'file_upload' into 'File Upload'"""
+    return name.replace('_', ' ').title()
+
+
+@lru_cache(maxsize=256)
+def _key_action_kind(action_display):
+    """Classify a display action: 'key_delete', 'key' for other key/pairing events, else None"""
+    action_upper = action_display.upper()
+    if 'KEY' not in action_upper and 'PAIRING' not in action_upper:
+        return None
+    return 'key_delete' if action_upper == 'KEY_DELETE' else 'key'
+
+
+@lru_cache(maxsize=8192)
+def _format_timestamp(timestamp):
+    """Render an ISO timestamp as 'YYYY-MM-DD HH:MM:SS', or return it unchanged if unparsable"""
+    try:
+        dt = datetime.fromisoformat(timestamp[:-1] + '+00:00' if timestamp.endswith('Z') else timestamp)
+        return dt.strftime('%Y-%m-%d %H:%M:%S')
+    except:
+        return timestamp
+
+
 @audit_bp.route('/logs', methods=['GET'])
 def get_audit_logs():
     """Get audit logs from both login_audit (auth events) and audit_logs (all other events)"""
@@ -74,6 +102,10 @@ def get_audit_logs():
                 audit_response = type('obj', (object,), {'data': []})()
 
         formatted_logs = []
+        # Normalise filters once rather than per log row
+        action_lower = action.lower() if action else None
+        result_upper = result.upper() if result else None
+        search_lower = search_query.lower() if search_query else None
 
         for log in login_response.data:
             user_info = log.get('users', {})
@@ -81,19 +113,12 @@ def get_audit_logs():
             user_id_display = user_info.get('user_id', 'N/A') if user_info else 'N/A'
 
             timestamp = log.get('created_at', '')
-            if timestamp:
-                try:
-                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    timestamp_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    timestamp_str = timestamp
-            else:
-                timestamp_str = ''
+            timestamp_str = _format_timestamp(timestamp) if timestamp else ''
 
             event_type = log.get('event_type', 'login')
             error_message = log.get('error_message', '')
             result_status = 'FAILED' if error_message else 'OK'
-            action_display = event_type.replace('_', ' ').title()
+            action_display = _display_action(event_type)
             target = log.get('email', user_id_display)
 
             formatted_log = {
@@ -106,12 +131,11 @@ def get_audit_logs():
                 'details': error_message or ''
             }
 
-            if action and action.lower() not in action_display.lower():
+            if action_lower and action_lower not in action_display.lower():
                 continue
-            if result and result.upper() != result_status:
+            if result_upper and result_upper != result_status:
                 continue
-            if search_query:
-                search_lower = search_query.lower()
+            if search_lower:
                 user_str = str(formatted_log.get('user', '') or '').lower()
                 action_str = str(formatted_log.get('action', '') or '').lower()
                 target_str = str(formatted_log.get('target', '') or '').lower()
@@ -128,19 +152,12 @@ def get_audit_logs():
             user_id_display = user_info.get('user_id', 'N/A') if user_info else 'N/A'
 
             timestamp = log.get('created_at', '')
-            if timestamp:
-                try:
-                    dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                    timestamp_str = dt.strftime('%Y-%m-%d %H:%M:%S')
-                except:
-                    timestamp_str = timestamp
-            else:
-                timestamp_str = ''
+            timestamp_str = _format_timestamp(timestamp) if timestamp else ''
 
             result_status = 'FAILED' if log.get('result') == 'failure' else 'OK'
             error_message = log.get('error_message', '')
             action_text = log.get('action', 'Unknown')
-            action_display = action_text.replace('_', ' ').title()
+            action_display = _display_action(action_text)
 
             resource_type = log.get('resource_type', '')
             resource_id = log.get('resource_id', '')
@@ -163,12 +180,11 @@ def get_audit_logs():
                 'details': error_message or details or ''
             }
 
-            if action and action.lower() not in action_display.lower():
+            if action_lower and action_lower not in action_display.lower():
                 continue
-            if result and result.upper() != result_status:
+            if result_upper and result_upper != result_status:
                 continue
-            if search_query:
-                search_lower = search_query.lower()
+            if search_lower:
                 user_str = str(formatted_log.get('user', '') or '').lower()
                 action_str = str(formatted_log.get('action', '') or '').lower()
                 target_str = str(formatted_log.get('target', '') or '').lower()
@@ -182,24 +198,22 @@ def get_audit_logs():
         if exclude_keys:
             formatted_logs = [
                 log for log in formatted_logs
-                if log['action'].upper() == 'KEY_DELETE' or
-                ('KEY' not in log['action'].upper() and 'PAIRING' not in log['action'].upper())
+                if _key_action_kind(log['action']) != 'key'
             ]
 
         if keys_only:
             formatted_logs = [
                 log for log in formatted_logs
-                if 'KEY' in log['action'].upper() or 'PAIRING' in log['action'].upper()
+                if _key_action_kind(log['action']) is not None
             ]
 
-        formatted_logs.sort(key=lambda x: x['timestamp'], reverse=True)
-
         total_logs = len(formatted_logs)
         total_pages = max(1, (total_logs + per_page - 1) // per_page)
         page = min(page, total_pages)
         start = (page - 1) * per_page
         end = start + per_page
-        paginated_logs = formatted_logs[start:end]
+        # Only rows up to the end of the requested page need ordering
+        paginated_logs = heapq.nlargest(end, formatted_logs, key=lambda x: x['timestamp'])[start:]
 
         return jsonify({
             'success': True,
@@ -241,8 +255,8 @@ def get_audit_stats():
             })
 
         total_logs = len(all_logs)
-        success_count = len([log for log in all_logs if log['success']])
-        failed_count = len([log for log in all_logs if not log['success']])
+        success_count = sum(1 for log in all_logs if log['success'])
+        failed_count = total_logs - success_count
 
         action_counts = {}
         for log in all_logs:
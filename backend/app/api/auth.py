@@ -5,25 +5,79 @@ Handles login, OTP verification, password reset, etc.
 from flask import Blueprint, request, jsonify
 from app.utils.supabase_client import get_supabase_admin_client
 from app.utils.email_sender import send_otp_email
+from app.utils.otp_store import get_otp_store
+from app.utils.audit_logger import log_auth_event
+from app.utils.rate_limit import rate_limit
 import secrets
 import hashlib
-import sys
-from datetime import datetime, timedelta
+import hmac
+import bcrypt
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
 
 auth_bp = Blueprint('auth', __name__)
 
-# Temporary storage for OTP codes (in production, use Redis or database)
-otp_storage = {}
+# OTP emails go out in the background; the response does not depend on delivery
+_email_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='otp-email')
+
+# Columns read by login, the OTP flow and verify-code's response
+LOGIN_USER_COLUMNS = 'id, user_id, email, full_name, role, is_active, password_hash, password_reset_required'
 
 
 def generate_otp():
     """Generate a 6-digit OTP code"""
-    return str(secrets.randbelow(1000000)).zfill(6)
+    return f"{secrets.randbelow(1000000):06d}"
+
+
+# ~100-250ms per hash on typical server hardware; raise as hardware gets faster
+BCRYPT_ROUNDS = 12
+
+
+def _prehash(password: str) -> bytes:
+    # bcrypt ignores input past 72 bytes; a SHA-256 hex digest keeps long passwords significant
+    return hashlib.sha256(password.encode()).hexdigest().encode()
 
 
 def hash_password(password: str) -> str:
-    """Hash password using SHA-256"""
-    return hashlib.sha256(password.encode()).hexdigest()
+    """Hash password using bcrypt over a SHA-256 pre-hash"""
+    return bcrypt.hashpw(_prehash(password), bcrypt.gensalt(rounds=BCRYPT_ROUNDS)).decode()
+
+
+def is_legacy_password_hash(stored_hash: str) -> bool:
+    """True for hashes from before bcrypt (bare SHA-256 hex digests)"""
+    return not stored_hash.startswith('$2')
+
+
+def verify_password(password: str, stored_hash: str) -> bool:
+    """
+    Check a password against a stored hash in constant time.
+    Accepts both bcrypt hashes and legacy SHA-256 hex digests.
+    """
+    if not stored_hash:
+        return False
+    if is_legacy_password_hash(stored_hash):
+        # Take as long as a bcrypt check so legacy accounts are not distinguishable by timing
+        burn_password_check(password)
+        return hmac.compare_digest(_prehash(password), stored_hash.encode())
+    try:
+        return bcrypt.checkpw(_prehash(password), stored_hash.encode())
+    except ValueError:
+        return False
+
+
+# Built once at import so the first failed login is not slower than later ones
+_DUMMY_PASSWORD_HASH = hash_password(secrets.token_urlsafe(16)).encode()
+
+
+def burn_password_check(password: str) -> None:
+    """
+    Spend one bcrypt verification on paths with no real hash to check, so response
+    timing does not reveal whether an account exists.
+    """
+    bcrypt.checkpw(_prehash(password), _DUMMY_PASSWORD_HASH)
 
 
 def validate_password_strength(password: str) -> tuple[bool, str]:
@@ -85,15 +139,14 @@ def generate_user_id(role: str, full_name: str, nric: str, supabase) -> str:
     base_id = f"{initials}{prefix}"
     user_id = f"{base_id}-{nric_suffix}"
 
-    response = supabase.table('users').select('user_id').eq('user_id', user_id).execute()
-    if response.data and len(response.data) > 0:
+    # Fetch every taken variant (BASE-XXX, BASE2-XXX, ...) in one query instead of probing each
+    response = supabase.table('users').select('user_id').like('user_id', f"{base_id}%-{nric_suffix}").execute()
+    taken = {row['user_id'] for row in response.data or []}
+    if user_id in taken:
         counter = 2
-        while True:
-            new_user_id = f"{base_id}{counter}-{nric_suffix}"
-            check = supabase.table('users').select('user_id').eq('user_id', new_user_id).execute()
-            if not check.data or len(check.data) == 0:
-                return new_user_id
+        while f"{base_id}{counter}-{nric_suffix}" in taken:
             counter += 1
+        return f"{base_id}{counter}-{nric_suffix}"
     return user_id
 
 
@@ -105,45 +158,61 @@ def generate_temporary_password() -> str:
     return password
 
 
+def _report_otp_email(future, recipient_email):
+    try:
+        sent = future.result()
+    except Exception as e:
+        logger.error("OTP email to %s failed: %s", recipient_email, e)
+        return
+    if not sent:
+        logger.warning("OTP email to %s was not sent", recipient_email)
+
+
+def queue_otp_email(recipient_email: str, otp_code: str, user_name: str = None) -> None:
+    """Send the OTP email on a background thread and log the outcome"""
+    future = _email_executor.submit(
+        send_otp_email,
+        recipient_email=recipient_email,
+        otp_code=otp_code,
+        user_name=user_name
+    )
+    future.add_done_callback(lambda f: _report_otp_email(f, recipient_email))
+
+
 def send_otp_for_user(user: dict) -> dict:
     
     otp_code = generate_otp()
 
-    otp_key = f"{user['id']}_{user['email']}"
-    otp_storage[otp_key] = {
+    # The entry may sit in Redis; keep the password hash out of it
+    get_otp_store().set(user['email'], {
         'code': otp_code,
-        'expires_at': datetime.now() + timedelta(minutes=10),
-        'user': user
-    }
+        'user': {k: v for k, v in user.items() if k != 'password_hash'}
+    })
 
-    email_sent = send_otp_email(
+    queue_otp_email(
         recipient_email=user['email'],
         otp_code=otp_code,
         user_name=user.get('full_name')
     )
 
-    # Debug: print OTP to terminal
-    print("\n" + "="*60)
-    print(f"*** OTP CODE FOR {user['email']} ***")
-    print(f"*** Code: {otp_code} ***")
-    print(f"*** Email sent: {email_sent} ***")
-    print("="*60 + "\n")
+    # Local development without email: enable DEBUG logging to see the code
+    logger.debug("OTP code for %s: %s", user['email'], otp_code)
 
     # Log the otp_sent event
     try:
         supabase = get_supabase_admin_client()
-        supabase.rpc('log_simple_auth_event', {
+        log_auth_event(supabase, {
             'p_user_id': user['id'],
             'p_event_type': 'otp_sent',
             'p_email': user['email'],
             'p_metadata': {'user_id': user['user_id'], 'role': user['role']}
-        }).execute()
-    except Exception as e:
-        print(f"Failed to log auth event: {e}")
+        })
+    except Exception:
+        logger.exception("Failed to log auth event")
 
     return {
         'success': True,
-        'email_sent': email_sent
+        'email_queued': True
     }
 
 
@@ -195,7 +264,7 @@ def create_user():
         supabase = get_supabase_admin_client()
 
         # Check if email already exists
-        existing_user = supabase.table('users').select('*').eq('email', email).execute()
+        existing_user = supabase.table('users').select('id').eq('email', email).limit(1).execute()
         if existing_user.data and len(existing_user.data) > 0:
             return jsonify({
                 'success': False,
@@ -203,7 +272,7 @@ def create_user():
             }), 409
 
         # Check if NRIC already exists
-        existing_nric = supabase.table('users').select('*').eq('nric', nric).execute()
+        existing_nric = supabase.table('users').select('id').eq('nric', nric).limit(1).execute()
         if existing_nric.data and len(existing_nric.data) > 0:
             return jsonify({
                 'success': False,
@@ -273,10 +342,8 @@ def create_user():
                 }
 
                 supabase.table('patient_profiles').insert(profile_data).execute()
-            except Exception as e:
-                print(f"Error creating patient profile: {e}")
-                import traceback
-                traceback.print_exc()
+            except Exception:
+                logger.exception("Error creating patient profile")
                 # Don't fail user creation if profile creation fails
 
         return jsonify({
@@ -291,10 +358,8 @@ def create_user():
             }
         }), 201
 
-    except Exception as e:
-        print(f"Create user error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Create user error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while creating user'
@@ -302,6 +367,7 @@ def create_user():
 
 
 @auth_bp.route('/login', methods=['POST'])
+@rate_limit('login', limit=5, window=60, identity_field='userId')
 def login():
     
     try:
@@ -347,29 +413,34 @@ def login():
 
         supabase = get_supabase_admin_client()
 
-        # Query user from database with NRIC validation
-        response = supabase.table('users').select('*').eq('user_id', user_id).eq('role', role).eq('nric', nric).execute()
-
-        if not response.data or len(response.data) == 0:
-            try:
-                supabase.rpc('log_simple_auth_event', {
-                    'p_user_id': None,
-                    'p_event_type': 'login_failed',
-                    'p_email': None,
-                    'p_error_message': 'Invalid user ID, role, or NRIC',
-                    'p_metadata': {'user_id': user_id, 'role': role}
-                }).execute()
-            except:
-                pass
+        # Query user from database with NRIC validation. Every attempt does this lookup, so
+        # unknown and existing accounts answer after the same round trip.
+        response = supabase.table('users')\
+            .select(LOGIN_USER_COLUMNS)\
+            .eq('user_id', user_id)\
+            .eq('role', role)\
+            .eq('nric', nric)\
+            .limit(1)\
+            .execute()
+        user = response.data[0] if response.data else None
+
+        if user is None:
+            burn_password_check(password)
+            log_auth_event(supabase, {
+                'p_user_id': None,
+                'p_event_type': 'login_failed',
+                'p_email': None,
+                'p_error_message': 'Invalid user ID, role, or NRIC',
+                'p_metadata': {'user_id': user_id, 'role': role}
+            })
             return jsonify({
                 'success': False,
                 'message': 'Invalid credentials'
             }), 401
 
-        user = response.data[0]
-
         # Check if user is active
         if not user.get('is_active', False):
+            burn_password_check(password)
             return jsonify({
                 'success': False,
                 'message': 'Account is deactivated. Please contact administrator.'
@@ -378,29 +449,34 @@ def login():
         # Verify password
         stored_password_hash = user.get('password_hash')
         if not stored_password_hash:
+            burn_password_check(password)
             return jsonify({
                 'success': False,
                 'message': 'Account not properly configured. Please contact administrator.'
             }), 500
 
-        provided_password_hash = hash_password(password)
-
-        if provided_password_hash != stored_password_hash:
-            try:
-                supabase.rpc('log_simple_auth_event', {
-                    'p_user_id': user['id'],
-                    'p_event_type': 'login_failed',
-                    'p_email': user['email'],
-                    'p_error_message': 'Invalid password',
-                    'p_metadata': {'user_id': user_id, 'role': role}
-                }).execute()
-            except:
-                pass
+        if not verify_password(password, stored_password_hash):
+            log_auth_event(supabase, {
+                'p_user_id': user['id'],
+                'p_event_type': 'login_failed',
+                'p_email': user['email'],
+                'p_error_message': 'Invalid password',
+                'p_metadata': {'user_id': user_id, 'role': role}
+            })
             return jsonify({
                 'success': False,
                 'message': 'Invalid credentials'
             }), 401
 
+        # Upgrade legacy SHA-256 hashes now that the plaintext is known to be correct
+        if is_legacy_password_hash(stored_password_hash):
+            try:
+                supabase.table('users').update({
+                    'password_hash': hash_password(password)
+                }).eq('id', user['id']).execute()
+            except Exception:
+                logger.exception("Failed to upgrade password hash")
+
         if user['role'] == 'admin':
             # Admin - wait for biometric verification
             return jsonify({
@@ -437,19 +513,17 @@ def login():
             },
         }), 200
 
-    except Exception as e:
-        import traceback
-        print(f"Login error: {e}")
-        print(f"Traceback: {traceback.format_exc()}")
+    except Exception:
+        logger.exception("Login error")
         return jsonify({
             'success': False,
-            'message': 'An error occurred during login',
-            'error': str(e) if __debug__ else None
+            'message': 'An error occurred during login'
         }), 500
 
 
 @auth_bp.route('/verify-code', methods=['POST'])
 @auth_bp.route('/verify', methods=['POST']) 
+@rate_limit('verify-code', limit=5, window=60, identity_field='email')
 def verify_code():
     """
     Verify OTP code
@@ -467,31 +541,27 @@ def verify_code():
                 'message': 'Email and code are required'
             }), 400
 
-        # Find OTP entry
-        otp_entry = None
-        otp_key = None
-        for key, value in otp_storage.items():
-            if email in key:
-                otp_entry = value
-                otp_key = key
-                break
-
-        if not otp_entry:
+        # Codes are six ASCII digits; reject anything else before comparing
+        if not (isinstance(code, str) and len(code) == 6 and code.isascii() and code.isdigit()):
             return jsonify({
                 'success': False,
-                'message': 'No verification code found. Please login again.'
-            }), 404
+                'message': 'Invalid verification code format'
+            }), 400
 
-        # Check if OTP is expired
-        if datetime.now() > otp_entry['expires_at']:
-            del otp_storage[otp_key]
+        # Find OTP entry; expired codes are evicted by the store
+        otp_store = get_otp_store()
+        otp_entry = otp_store.get(email)
+
+        if not otp_entry:
             return jsonify({
                 'success': False,
-                'message': 'Verification code has expired. Please login again.'
-            }), 400
+                'message': 'No verification code found or it has expired. Please login again.'
+            }), 404
 
-        # Verify OTP code
-        if otp_entry['code'] != code:
+        # Verify and remove the code in one step; a concurrent request with the same
+        # code gets None here, as does a wrong code
+        otp_entry = otp_store.consume(email, code)
+        if not otp_entry:
             return jsonify({
                 'success': False,
                 'message': 'Invalid verification code'
@@ -499,7 +569,6 @@ def verify_code():
 
         # OTP is valid
         user = otp_entry['user']
-        del otp_storage[otp_key]
 
         # Update last login timestamp
         supabase = get_supabase_admin_client()
@@ -508,14 +577,11 @@ def verify_code():
         }).eq('id', user['id']).execute()
 
         # Log successful login
-        try:
-            supabase.rpc('log_simple_auth_event', {
-                'p_user_id': user['id'],
-                'p_event_type': 'login_success',
-                'p_email': user['email']
-            }).execute()
-        except Exception as e:
-            print(f"Failed to log auth event: {e}")
+        log_auth_event(supabase, {
+            'p_user_id': user['id'],
+            'p_event_type': 'login_success',
+            'p_email': user['email']
+        })
 
         # Generate session token (in production, use JWT)
         session_token = secrets.token_urlsafe(32)
@@ -534,8 +600,8 @@ def verify_code():
             }
         }), 200
 
-    except Exception as e:
-        print(f"Verification error: {e}")
+    except Exception:
+        logger.exception("Verification error")
         return jsonify({
             'success': False,
             'message': 'An error occurred during verification'
@@ -543,6 +609,7 @@ def verify_code():
 
 
 @auth_bp.route('/resend-code', methods=['POST'])
+@rate_limit('resend-code', limit=3, window=60, identity_field='email')
 def resend_code():
     """
     Resend OTP code
@@ -560,13 +627,8 @@ def resend_code():
             }), 400
 
         # Find existing OTP entry
-        otp_entry = None
-        otp_key = None
-        for key, value in otp_storage.items():
-            if email in key:
-                otp_entry = value
-                otp_key = key
-                break
+        otp_store = get_otp_store()
+        otp_entry = otp_store.get(email)
 
         if not otp_entry:
             return jsonify({
@@ -578,13 +640,12 @@ def resend_code():
 
         # Generate new OTP and overwrite storage entry
         otp_code = generate_otp()
-        otp_storage[otp_key] = {
+        otp_store.set(email, {
             'code': otp_code,
-            'expires_at': datetime.now() + timedelta(minutes=10),
             'user': user
-        }
+        })
 
-        send_otp_email(
+        queue_otp_email(
             recipient_email=email,
             otp_code=otp_code,
             user_name=user.get('full_name')
@@ -593,22 +654,22 @@ def resend_code():
         # Log OTP resend
         try:
             supabase = get_supabase_admin_client()
-            supabase.rpc('log_simple_auth_event', {
+            log_auth_event(supabase, {
                 'p_user_id': user['id'],
                 'p_event_type': 'otp_sent',
                 'p_email': email,
                 'p_metadata': {'action': 'resend'}
-            }).execute()
-        except Exception as e:
-            print(f"Failed to log auth event: {e}")
+            })
+        except Exception:
+            logger.exception("Failed to log auth event")
 
         return jsonify({
             'success': True,
             'message': 'Code sent successfully',
         }), 200
 
-    except Exception as e:
-        print(f"Resend error: {e}")
+    except Exception:
+        logger.exception("Resend error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while resending code'
@@ -638,7 +699,7 @@ def reset_password():
             }), 400
 
         supabase = get_supabase_admin_client()
-        response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+        response = supabase.table('users').select('id, email, password_hash').eq('user_id', user_id).execute()
 
         if not response.data or len(response.data) == 0:
             return jsonify({
@@ -650,9 +711,8 @@ def reset_password():
 
         # Verify old password
         stored_password_hash = user.get('password_hash')
-        provided_password_hash = hash_password(old_password)
 
-        if provided_password_hash != stored_password_hash:
+        if not verify_password(old_password, stored_password_hash):
             return jsonify({
                 'success': False,
                 'message': 'Current password is incorrect'
@@ -673,22 +733,19 @@ def reset_password():
             }), 500
 
         # Log password reset
-        try:
-            supabase.rpc('log_simple_auth_event', {
-                'p_user_id': user['id'],
-                'p_event_type': 'password_reset',
-                'p_email': user['email']
-            }).execute()
-        except Exception as e:
-            print(f"Failed to log password reset: {e}")
+        log_auth_event(supabase, {
+            'p_user_id': user['id'],
+            'p_event_type': 'password_reset',
+            'p_email': user['email']
+        })
 
         return jsonify({
             'success': True,
             'message': 'Password reset successfully'
         }), 200
 
-    except Exception as e:
-        print(f"Password reset error: {e}")
+    except Exception:
+        logger.exception("Password reset error")
         return jsonify({
             'success': False,
             'message': 'An error occurred during password reset'
@@ -709,25 +766,25 @@ def logout():
         if user_id:
             try:
                 supabase = get_supabase_admin_client()
-                user_response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+                user_response = supabase.table('users').select('id, email').eq('user_id', user_id).execute()
 
                 if user_response.data and len(user_response.data) > 0:
                     user = user_response.data[0]
-                    supabase.rpc('log_simple_auth_event', {
+                    log_auth_event(supabase, {
                         'p_user_id': user['id'],
                         'p_event_type': 'logout',
                         'p_email': user['email']
-                    }).execute()
-            except Exception as e:
-                print(f"Failed to log logout event: {e}")
+                    })
+            except Exception:
+                logger.exception("Failed to log logout event")
 
         return jsonify({
             'success': True,
             'message': 'Logged out successfully'
         }), 200
 
-    except Exception as e:
-        print(f"Logout error: {e}")
+    except Exception:
+        logger.exception("Logout error")
         return jsonify({
             'success': False,
             'message': 'An error occurred during logout'
@@ -760,7 +817,7 @@ def get_users():
                     if days_diff > 90:
                         inactive_days = days_diff
                 except Exception as e:
-                    print(f"Error calculating inactive days for user {user.get('user_id')}: {e}")
+                    logger.warning("Error calculating inactive days for user %s: %s", user.get('user_id'), e)
 
             users_with_status.append({
                 'id': user['user_id'],
@@ -778,10 +835,8 @@ def get_users():
             'users': users_with_status
         }), 200
 
-    except Exception as e:
-        print(f"Get users error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get users error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while fetching users'
@@ -817,10 +872,8 @@ def get_user_by_id(user_id):
             'last_login': user.get('last_login')
         }), 200
 
-    except Exception as e:
-        print(f"Get user error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get user error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while fetching user'
@@ -883,10 +936,8 @@ def get_patient_profile(user_id):
             }
         }), 200
 
-    except Exception as e:
-        print(f"Get patient profile error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Get patient profile error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while fetching patient profile'
@@ -902,7 +953,7 @@ def delete_user(user_id):
     try:
         supabase = get_supabase_admin_client()
 
-        user_response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+        user_response = supabase.table('users').select('id, email, role').eq('user_id', user_id).execute()
         if not user_response.data or len(user_response.data) == 0:
             return jsonify({
                 'success': False,
@@ -915,8 +966,8 @@ def delete_user(user_id):
         if user['role'] == 'patient':
             try:
                 supabase.table('patient_profiles').delete().eq('custom_user_id', user_id).execute()
-            except Exception as e:
-                print(f"Error deleting patient profile: {e}")
+            except Exception:
+                logger.exception("Error deleting patient profile")
 
         # Delete the user
         response = supabase.table('users').delete().eq('user_id', user_id).execute()
@@ -926,26 +977,28 @@ def delete_user(user_id):
                 'message': 'Failed to delete user'
             }), 500
 
+        from app.api.files import invalidate_users_cache
+        from app.api.notifications import invalidate_user_uuid_cache
+        invalidate_users_cache(user_id)
+        # The UUID may also have been cached under its own string form
+        invalidate_user_uuid_cache(user_id)
+        invalidate_user_uuid_cache(user['id'])
+
         # Log deletion
-        try:
-            supabase.rpc('log_simple_auth_event', {
-                'p_user_id': user['id'],
-                'p_event_type': 'user_deleted',
-                'p_email': user['email'],
-                'p_metadata': {'deleted_user_id': user_id, 'deleted_role': user['role']}
-            }).execute()
-        except:
-            pass
+        log_auth_event(supabase, {
+            'p_user_id': user['id'],
+            'p_event_type': 'user_deleted',
+            'p_email': user['email'],
+            'p_metadata': {'deleted_user_id': user_id, 'deleted_role': user['role']}
+        })
 
         return jsonify({
             'success': True,
             'message': 'User deleted successfully'
         }), 200
 
-    except Exception as e:
-        print(f"Delete user error: {e}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Delete user error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while deleting user'
@@ -972,7 +1025,7 @@ def update_user(user_id):
 
         supabase = get_supabase_admin_client()
 
-        user_response = supabase.table('users').select('*').eq('user_id', user_id).execute()
+        user_response = supabase.table('users').select('id').eq('user_id', user_id).execute()
         if not user_response.data or len(user_response.data) == 0:
             return jsonify({
                 'success': False,
@@ -992,6 +1045,9 @@ def update_user(user_id):
                 'message': 'Failed to update user'
             }), 500
 
+        from app.api.files import invalidate_users_cache
+        invalidate_users_cache(user_id)
+
         return jsonify({
             'success': True,
             'message': 'User updated successfully',
@@ -1002,8 +1058,8 @@ def update_user(user_id):
             }
         }), 200
 
-    except Exception as e:
-        print(f"Update user error: {e}")
+    except Exception:
+        logger.exception("Update user error")
         return jsonify({
             'success': False,
             'message': 'An error occurred while updating user'
@@ -3,7 +3,7 @@ import secrets
 import base64
 import os
 from datetime import datetime, timedelta
-from supabase import create_client
+from app.utils.supabase_client import get_cached_client
 
 # Configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
@@ -13,15 +13,14 @@ SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 if not SUPABASE_SERVICE_ROLE_KEY:
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase = get_cached_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 # Blueprint for biometric routes
 biometric_bp = Blueprint('biometric', __name__)
 
 # Helper function to get client IP address
 def get_client_ip():
-    if request.headers.get('X-Forwarded-For'):
-        return request.headers.get('X-Forwarded-For').split(',')[0].strip()
+    # ProxyFix (see create_app) has already resolved X-Forwarded-For to the client address
     return request.remote_addr
 
 # ===== Generate Challenge =====
@@ -208,7 +207,7 @@ def verify_biometric():
         }).eq('credential_id', credential_id).execute()
 
         # ===== Admin post-biometric (send OTP and return full user info) =====
-        user_row = supabase.table('users').select('*').eq('user_id', user_id).execute()
+        user_row = supabase.table('users').select('id, user_id, email, full_name, role, password_reset_required').eq('user_id', user_id).limit(1).execute()
 
         if user_row.data and user_row.data[0].get('role') == 'admin':
             user = user_row.data[0]
@@ -216,7 +215,7 @@ def verify_biometric():
             from app.api.auth import send_otp_for_user
             result = send_otp_for_user(user)
 
-            print(f"OTP sent for admin {user_id}: email_sent={result.get('email_sent')}")
+            print(f"OTP queued for admin {user_id}: email_queued={result.get('email_queued')}")
 
             return jsonify({
                 'message': 'Biometric authentication successful. OTP sent.',
@@ -3,14 +3,20 @@ from flask import Blueprint, request, jsonify, send_file
 from werkzeug.utils import secure_filename
 import os
 import uuid
-from supabase import create_client
+from app.utils.supabase_client import get_cached_client
 from datetime import datetime, timedelta
 import io
 import base64
+import heapq
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from app.models.storage import key_pair_store
 from app.crypto.encryption import EncryptionManager
 from app.utils.audit_logger import log_file_delete
+from app.utils.validators import is_uuid
+from app.utils.query_filters import contains_pattern, contains_match, pattern_is_exact
 from config import Config
+from cachetools import TTLCache
 import logging
 
 
@@ -22,15 +28,88 @@ STORAGE_BUCKET = 'encrypted-files'
 MAX_FILE_SIZE = 50*1024*1024
 ALLOWED_FILE_EXTENSIONS = {'.pdf', '.png', '.jpg', '.jpeg'}
 
+# Columns needed to render a file row; skips encryption_metadata and storage details
+FILE_LIST_COLUMNS = 'id, original_filename, file_size, uploaded_at, file_extension, owner_id, userid, last_accessed_at'
+
 # Initialize Supabase
 if not SUPABASE_SERVICE_ROLE_KEY:
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase = get_cached_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 # Blueprint for file routes
 files_bp = Blueprint('files', __name__, url_prefix='/api/files')
 
+# Shared pool for overlapping independent Supabase round trips within a request
+_query_executor = ThreadPoolExecutor(max_workers=8, thread_name_prefix='files-query')
+
+# Short-lived cache of formatted MyFiles responses, keyed on (user_uuid, query params).
+# Polling UIs hit the same listing repeatedly; mutations invalidate explicitly.
+_FILES_CACHE = TTLCache(maxsize=2048, ttl=5)
+_files_cache_lock = threading.Lock()
+
+# Display names change rarely; cache user rows per user_id across requests
+_USERS_CACHE = TTLCache(maxsize=1024, ttl=60)
+_users_cache_lock = threading.Lock()
+
+
+def invalidate_files_cache(user_uuid=None):
+    """Drop cached MyFiles listings for one user, or for everyone when no user is given"""
+    with _files_cache_lock:
+        if user_uuid is None:
+            _FILES_CACHE.clear()
+            return
+        for key in [k for k in _FILES_CACHE if k[0] == user_uuid]:
+            _FILES_CACHE.pop(key, None)
+
+def invalidate_users_cache(user_id=None):
+    """Drop a cached user row, or every cached row when no user is given"""
+    with _users_cache_lock:
+        if user_id is None:
+            _USERS_CACHE.clear()
+        else:
+            _USERS_CACHE.pop(user_id, None)
+
+def _query_users_by_ids(user_ids):
+    """Fetch users for a collection of text user_ids in one query, keyed by user_id"""
+    user_ids = {uid for uid in user_ids if uid}
+    if not user_ids:
+        return {}
+    users = {}
+    with _users_cache_lock:
+        for uid in user_ids:
+            user = _USERS_CACHE.get(uid)
+            if user is not None:
+                users[uid] = user
+    missing = list(user_ids - users.keys())
+    if not missing:
+        return users
+    try:
+        response = supabase.table('users')\
+            .select('user_id, full_name')\
+            .in_('user_id', missing)\
+            .execute()
+    except Exception:
+        return users
+    fetched = {user['user_id']: user for user in response.data or []}
+    with _users_cache_lock:
+        _USERS_CACHE.update(fetched)
+    users.update(fetched)
+    return users
+
+
+def _user_info_lookup(users_by_id):
+    """Build a (display_name, user_id) resolver over prefetched users"""
+    def get_user_info(user_id):
+        if not user_id:
+            return ('Unknown', 'Unknown')
+        user = users_by_id.get(user_id)
+        if user:
+            return (user['full_name'] or user_id, user['user_id'])
+        return (user_id, user_id)
+    return get_user_info
+
+
 # ===== Upload File (status: 'pending') =====
 @files_bp.route('/upload', methods=['POST'])
 def upload_file():
@@ -45,6 +124,10 @@ def upload_file():
         
         if not user_id:
              return jsonify({'error': 'User ID is required'}), 400
+        
+        # Reject before the storage upload; a bad userid would only fail at the row insert
+        if user_uuid and not is_uuid(user_uuid):
+             return jsonify({'error': 'Invalid user UUID'}), 400
              
         if not encryption_metadata_str:
              return jsonify({'error': 'Encryption metadata is required'}), 400
@@ -100,6 +183,8 @@ def upload_file():
         else:
              return jsonify({'error': 'Failed to save file record'}), 500
         
+        invalidate_files_cache(user_uuid)
+        
         return jsonify({
             'message': 'File uploaded successfully!',
             'file_id': file_id,
@@ -124,6 +209,8 @@ def confirm_upload(file_id):
         if not result.data:
             return jsonify({'error': 'File not found or already confirmed'}), 404
         
+        invalidate_files_cache(result.data[0].get('userid'))
+        
         return jsonify({'message': 'Upload confirmed successfully'}), 200
     
     except Exception as e:
@@ -139,17 +226,14 @@ def get_my_files():
         user_uuid = request.args.get('user_uuid')
         if not user_uuid:
             return jsonify({'error': 'User UUID is required'}), 400
+        if not is_uuid(user_uuid):
+            return jsonify({'error': 'Invalid user UUID'}), 400
         
-        user_text_id_query = supabase.table('users')\
-            .select('user_id, full_name')\
-            .eq('id', user_uuid)\
-            .execute()
-        
-        if not user_text_id_query.data:
-            return jsonify({'error': 'User not found'}), 404
-        
-        current_user_id = user_text_id_query.data[0]['user_id']
-        current_user_name = user_text_id_query.data[0].get('full_name') or current_user_id
+        cache_key = (user_uuid, tuple(sorted(request.args.items())))
+        with _files_cache_lock:
+            cached = _FILES_CACHE.get(cache_key)
+        if cached is not None:
+            return jsonify(cached), 200
         
         # Get query parameters
         search_query = request.args.get('search', '').strip().lower()
@@ -160,97 +244,109 @@ def get_my_files():
         limit = min(int(request.args.get('limit', 20)), 100)
         start_idx = (page - 1) * limit
         
-        # Helper: Get user name
-        user_name_cache = {}
-        def get_user_name(uid):
-            if uid in user_name_cache:
-                return user_name_cache[uid]
-            
-            if uid == current_user_id:
-                user_name_cache[uid] = current_user_name
-                return current_user_name
-            
-            try:
-                result = supabase.table('users')\
-                    .select('user_id, full_name')\
-                    .eq('user_id', uid)\
-                    .execute()
-                
-                if result.data:
-                    user_data = result.data[0]
-                    full_name = user_data.get('full_name')
-                    
-                    if full_name and str(full_name).strip():
-                        display_name = str(full_name).strip()
-                    else:
-                        display_name = uid
-                else:
-                    display_name = uid
-            except Exception:
-                display_name = uid
-            
-            user_name_cache[uid] = display_name
-            return display_name
+        # Owned files are keyed by UUID, so that query overlaps the user lookup instead of waiting on it
+        user_query = supabase.table('users')\
+            .select('user_id, full_name')\
+            .eq('id', user_uuid)
+        user_future = _query_executor.submit(user_query.execute)
         
-        # Fetch owned files
-        owned_files = []
+        owned_future = None
         if filter_type in ['owned', 'my_uploads', 'shared', 'all']:
+            # Active shares ride along as an embed instead of a second file_shares round trip
+            shares_embed = 'file_shares!inner' if filter_type == 'shared' else 'file_shares'
             owned_query = supabase.table('encrypted_files')\
-                .select('*')\
+                .select(f'{FILE_LIST_COLUMNS}, {shares_embed}(shared_at, shared_with)')\
                 .eq('userid', user_uuid)\
                 .eq('is_deleted', False)\
                 .eq('upload_status', 'completed')\
-                .execute()
-            owned_files = owned_query.data
-        
-        # Fetch shares for owned files (BATCH QUERY)
-        file_shares_map = {}
-        if owned_files:
-            file_ids = [f['id'] for f in owned_files]
-            shares_batch = supabase.table('file_shares')\
-                .select('file_id, shared_at, shared_with')\
-                .in_('file_id', file_ids)\
-                .eq('share_status', 'active')\
-                .execute()
-            
-            for share in shares_batch.data:
-                fid = share['file_id']
-                if fid not in file_shares_map:
-                    file_shares_map[fid] = []
-                file_shares_map[fid].append(share)
+                .eq('file_shares.share_status', 'active')
+            if search_query:
+                owned_query = owned_query.ilike('original_filename', contains_pattern(search_query))
+            owned_future = _query_executor.submit(owned_query.execute)
+        
+        user_text_id_query = user_future.result()
+        
+        if not user_text_id_query.data:
+            return jsonify({'error': 'User not found'}), 404
+        
+        current_user_id = user_text_id_query.data[0]['user_id']
+        current_user_name = user_text_id_query.data[0].get('full_name') or current_user_id
         
         # Fetch shared files (files shared WITH this user)
         shared_files = []
         if filter_type in ['received', 'all']:
             shared_query = supabase.table('file_shares')\
-                .select('*, encrypted_files(*)')\
+                .select(f'id, shared_by, shared_at, access_level, encrypted_files!inner({FILE_LIST_COLUMNS})')\
                 .eq('shared_with', current_user_id)\
                 .eq('share_status', 'active')\
-                .execute()
+                .eq('encrypted_files.is_deleted', False)\
+                .eq('encrypted_files.upload_status', 'completed')
+            if search_query:
+                shared_query = shared_query.ilike('encrypted_files.original_filename', contains_pattern(search_query))
+            shared_query = shared_query.execute()
             
             for share in shared_query.data:
                 file_data = share.get('encrypted_files')
-                if file_data and not file_data.get('is_deleted') and file_data.get('upload_status') == 'completed':
+                if file_data:
                     shared_files.append({
                         'file_data': file_data,
                         'share_data': share
                     })
         
+        # Collect owned files only now, so their query overlaps the received-files round trip
+        owned_files = owned_future.result().data if owned_future else []
+        
+        # ilike widened each '*' in the search to any one character; drop rows that only matched that way
+        if search_query and not pattern_is_exact(search_query):
+            owned_files = [f for f in owned_files if contains_match(f['original_filename'], search_query)]
+            shared_files = [item for item in shared_files
+                            if contains_match(item['file_data']['original_filename'], search_query)]
+        
+        # Shares for owned files come embedded in the owned-files rows
+        file_shares_map = {f['id']: f.pop('file_shares', None) or [] for f in owned_files}
+        
+        # Resolve every owner, sharer and recipient name in one batch query
+        name_ids = {f['owner_id'] for f in owned_files}
+        for shares_for_file in file_shares_map.values():
+            name_ids.update(share.get('shared_with') for share in shares_for_file)
+        for item in shared_files:
+            name_ids.add(item['file_data']['owner_id'])
+            name_ids.add(item['share_data']['shared_by'])
+        name_ids.discard(current_user_id)
+        users_by_id = _query_users_by_ids(name_ids)
+        
+        # Helper: Get user name (seeded with the current user, who owns most rows)
+        user_name_cache = {current_user_id: current_user_name}
+        def get_user_name(uid):
+            if uid in user_name_cache:
+                return user_name_cache[uid]
+            
+            full_name = users_by_id.get(uid, {}).get('full_name')
+            if full_name and str(full_name).strip():
+                display_name = str(full_name).strip()
+            else:
+                display_name = uid
+            
+            user_name_cache[uid] = display_name
+            return display_name
+        
         # Build file objects
         files = []
         
         # Add owned files
         for f in owned_files:
-            shares_for_file = file_shares_map.get(f['id'], [])
+            shares_for_file = file_shares_map[f['id']]
             shared_count = len(shares_for_file)
-            shared_at = max([s['shared_at'] for s in shares_for_file if s.get('shared_at')], default=None)
+            if filter_type == 'shared' and not shared_count:
+                continue
             
+            shared_at = None
             shared_with_names = []
-            if shares_for_file:
-                for share in shares_for_file:
-                    if share.get('shared_with'):
-                        name = get_user_name(share['shared_with'])
-                        shared_with_names.append(name)
+            for share in shares_for_file:
+                if share.get('shared_at') and (shared_at is None or share['shared_at'] > shared_at):
+                    shared_at = share['shared_at']
+                if share.get('shared_with'):
+                    shared_with_names.append(get_user_name(share['shared_with']))
             
             owner_id = f['owner_id']
             owner_name = get_user_name(owner_id)
@@ -274,9 +370,6 @@ def get_my_files():
                 'shared_at': shared_at
             }
             
-            if filter_type == 'shared' and not file_obj['is_shared']:
-                continue
-            
             files.append(file_obj)
         
         # Add shared files (received)
@@ -311,29 +404,25 @@ def get_my_files():
                 'shared_with_names': []
             })
         
-        # Apply search filter
+        # Apply search filter (the ilike pushdown narrows rows; this keeps exact substring semantics)
         if search_query:
             files = [f for f in files if search_query in f['name'].lower()]
         
         # Apply sorting
         if sort_by == 'name':
-            files.sort(key=lambda x: (x['name'] or '').lower(), reverse=(sort_order == 'desc'))
+            sort_key = lambda x: (x['name'] or '').lower()
         elif sort_by == 'size':
-            files.sort(key=lambda x: (x['size'] is not None, x['size'] or 0), reverse=(sort_order == 'desc'))
+            sort_key = lambda x: (x['size'] is not None, x['size'] or 0)
         else:
-            def get_sort_timestamp(file):
-                timestamps = []
-                if file.get('uploaded_at'):
-                    timestamps.append(file['uploaded_at'])
-                if file.get('shared_at'):
-                    timestamps.append(file['shared_at'])
-                return max(timestamps) if timestamps else ''
-            files.sort(key=get_sort_timestamp, reverse=(sort_order == 'desc'))
+            # Most recent of upload/share time; '' sorts below any timestamp
+            sort_key = lambda x: max(x.get('uploaded_at') or '', x.get('shared_at') or '')
         
+        # Only rows up to the end of the requested page need ordering
         total_files = len(files)
-        files = files[start_idx:start_idx + limit]
+        select_top = heapq.nlargest if sort_order == 'desc' else heapq.nsmallest
+        files = select_top(start_idx + limit, files, key=sort_key)[start_idx:]
         
-        return jsonify({
+        payload = {
             'files': files,
             'total': total_files,
             'page': page,
@@ -346,7 +435,11 @@ def get_my_files():
                 'sort': sort_by,
                 'order': sort_order
             }
-        }), 200
+        }
+        with _files_cache_lock:
+            _FILES_CACHE[cache_key] = payload
+        
+        return jsonify(payload), 200
     
     except ValueError as e:
         return jsonify({'error': f'Invalid parameter: {str(e)}'}), 400
@@ -360,7 +453,7 @@ def get_my_files():
 def download_file(file_id):
     try:
         response = supabase.table('encrypted_files')\
-            .select('*')\
+            .select('original_filename, storage_path')\
             .eq('id', file_id)\
             .execute()
         
@@ -390,6 +483,8 @@ def delete_file(file_id):
         
         if not user_id:
              return jsonify({'error': 'User ID is required'}), 400
+        if not is_uuid(user_id):
+             return jsonify({'error': 'Invalid user UUID'}), 400
         
         file_info = supabase.table('encrypted_files')\
             .select('original_filename')\
@@ -405,6 +500,7 @@ def delete_file(file_id):
             .execute()
         
         if result.data:
+            invalidate_files_cache(user_id)
             log_file_delete(
                 user_id=user_id,
                 filename=file_name,
@@ -430,7 +526,7 @@ def cleanup_pending_uploads():
         cutoff_time = (datetime.now() - timedelta(minutes=3)).isoformat()
         
         response = supabase.table('encrypted_files')\
-            .select('*')\
+            .select('id, storage_path')\
             .eq('upload_status', 'pending')\
             .lt('uploaded_at', cutoff_time)\
             .execute()
@@ -476,12 +572,16 @@ def get_file_metadata(file_id):
         user_uuid = request.args.get('user_uuid')
         if not user_uuid:
             return jsonify({'error': 'User UUID is required'}), 400
+        if not is_uuid(user_uuid):
+            return jsonify({'error': 'Invalid user UUID'}), 400
         
+        # Active recipients come back embedded, so access is decided without a separate share query
         response = supabase.table('encrypted_files')\
-            .select('id, original_filename, encryption_metadata, userid')\
+            .select('id, original_filename, encryption_metadata, userid, file_shares(shared_with)')\
             .eq('id', file_id)\
             .eq('is_deleted', False)\
             .eq('upload_status', 'completed')\
+            .eq('file_shares.share_status', 'active')\
             .execute()
         
         if not response.data:
@@ -490,6 +590,7 @@ def get_file_metadata(file_id):
         file_data = response.data[0]
         
         if file_data['userid'] != user_uuid:
+            # Resolve the requester first so an unknown user gets 404 even when nothing is shared
             user_query = supabase.table('users')\
                 .select('user_id')\
                 .eq('id', user_uuid)\
@@ -498,16 +599,8 @@ def get_file_metadata(file_id):
             if not user_query.data:
                 return jsonify({'error': 'User not found'}), 404
             
-            user_text_id = user_query.data[0]['user_id']
-            
-            share_query = supabase.table('file_shares')\
-                .select('id')\
-                .eq('file_id', file_id)\
-                .eq('shared_with', user_text_id)\
-                .eq('share_status', 'active')\
-                .execute()
-            
-            if not share_query.data:
+            recipients = [s['shared_with'] for s in file_data.get('file_shares') or []]
+            if user_query.data[0]['user_id'] not in recipients:
                 return jsonify({'error': 'Access denied'}), 403
         
         return jsonify({
@@ -535,22 +628,14 @@ def get_all_file_shares():
             return jsonify({'success': True, 'shares': []}), 200
         
         enriched_shares = []
-        user_cache = {}
+        user_ids = set()
+        for share in shares_response.data:
+            user_ids.update((share.get('encrypted_files', {}).get('owner_id'), share['shared_by'], share['shared_with']))
+        users_by_id = _query_users_by_ids(user_ids)
         
         def get_user_name(user_id):
-            if user_id in user_cache:
-                return user_cache[user_id]
-            try:
-                user_response = supabase.table('users')\
-                    .select('full_name')\
-                    .eq('user_id', user_id)\
-                    .execute()
-                if user_response.data:
-                    name = user_response.data[0]['full_name']
-                    user_cache[user_id] = name
-                    return name
-            except:
-                pass
+            if user_id in users_by_id:
+                return users_by_id[user_id]['full_name']
             return 'Unknown'
         
         for share in shares_response.data:
@@ -588,37 +673,25 @@ def get_all_file_shares():
 def get_all_file_operations():
     """Get all file operations (uploads and shares) for admin file logs page"""
     try:
-        user_cache = {}
-        
-        def get_user_info(user_id):
-            """Returns tuple of (full_name, user_id) for display"""
-            if not user_id:
-                return ('Unknown', 'Unknown')
-            if user_id in user_cache:
-                return user_cache[user_id]
-            try:
-                user_response = supabase.table('users')\
-                    .select('full_name, user_id')\
-                    .eq('user_id', user_id)\
-                    .execute()
-                if user_response.data:
-                    name = user_response.data[0]['full_name'] or user_id
-                    uid = user_response.data[0]['user_id']
-                    user_cache[user_id] = (name, uid)
-                    return (name, uid)
-            except:
-                pass
-            user_cache[user_id] = (user_id, user_id)
-            return (user_id, user_id)
-        
-        operations = []
-        
-        uploads_response = supabase.table('encrypted_files')\
-            .select('id, original_filename, owner_id, uploaded_at, upload_status')\
+        uploads_query = supabase.table('encrypted_files')\
+            .select('id, original_filename, owner_id, uploaded_at')\
             .eq('upload_status', 'completed')\
             .eq('is_deleted', False)\
-            .order('uploaded_at', desc=True)\
+            .order('uploaded_at', desc=True)
+        uploads_future = _query_executor.submit(uploads_query.execute)
+        
+        shares_response = supabase.table('file_shares')\
+            .select('id, shared_by, shared_with, shared_at, share_status, encrypted_files(original_filename, owner_id)')\
+            .order('shared_at', desc=True)\
             .execute()
+        uploads_response = uploads_future.result()
+        
+        user_ids = {upload['owner_id'] for upload in uploads_response.data}
+        for share in shares_response.data:
+            user_ids.update((share.get('encrypted_files', {}).get('owner_id', share['shared_by']), share['shared_with']))
+        get_user_info = _user_info_lookup(_query_users_by_ids(user_ids))
+        
+        operations = []
         
         for upload in uploads_response.data:
             owner_name, owner_uid = get_user_info(upload['owner_id'])
@@ -635,11 +708,6 @@ def get_all_file_operations():
                 'status': 'completed'
             })
         
-        shares_response = supabase.table('file_shares')\
-            .select('*, encrypted_files(original_filename, owner_id)')\
-            .order('shared_at', desc=True)\
-            .execute()
-        
         for share in shares_response.data:
             file_info = share.get('encrypted_files', {})
             owner_id = file_info.get('owner_id', share['shared_by'])
@@ -679,28 +747,6 @@ def get_outdated_files():
         days_old = int(request.args.get('days', 90))
         cutoff_date = (datetime.now() - timedelta(days=days_old)).isoformat()
         
-        user_cache = {}
-        
-        def get_user_info(user_id):
-            if not user_id:
-                return ('Unknown', 'Unknown')
-            if user_id in user_cache:
-                return user_cache[user_id]
-            try:
-                user_response = supabase.table('users')\
-                    .select('full_name, user_id')\
-                    .eq('user_id', user_id)\
-                    .execute()
-                if user_response.data:
-                    name = user_response.data[0]['full_name'] or user_id
-                    uid = user_response.data[0]['user_id']
-                    user_cache[user_id] = (name, uid)
-                    return (name, uid)
-            except:
-                pass
-            user_cache[user_id] = (user_id, user_id)
-            return (user_id, user_id)
-        
         outdated_response = supabase.table('encrypted_files')\
             .select('id, original_filename, owner_id, uploaded_at, file_size, file_extension')\
             .eq('upload_status', 'completed')\
@@ -709,6 +755,10 @@ def get_outdated_files():
             .order('uploaded_at', desc=False)\
             .execute()
         
+        get_user_info = _user_info_lookup(
+            _query_users_by_ids(file['owner_id'] for file in outdated_response.data)
+        )
+        
         outdated_files = []
         for file in outdated_response.data:
             owner_name, owner_uid = get_user_info(file['owner_id'])
@@ -748,7 +798,11 @@ def delete_outdated_files():
         deleted_count = 0
         errors = []
         
-        for file_id in file_ids:
+        # Repeated ids would re-run the storage removal, revoke and audit log for the same file
+        seen = set()
+        unique_file_ids = [fid for fid in file_ids if not (fid in seen or seen.add(fid))]
+        
+        for file_id in unique_file_ids:
             try:
                 file_response = supabase.table('encrypted_files')\
                     .select('storage_path')\
@@ -787,6 +841,9 @@ def delete_outdated_files():
             except Exception as file_error:
                 errors.append(f"Error deleting {file_id}: {str(file_error)}")
         
+        if deleted_count:
+            invalidate_files_cache()
+        
         return jsonify({
             'success': True,
             'deleted_count': deleted_count,
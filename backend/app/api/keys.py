@@ -29,18 +29,20 @@ def generate_key_pair():
         from app.utils.supabase_client import get_supabase_admin_client
         supabase = get_supabase_admin_client()
         
+        # Fetch both users in one round trip
+        users_res = supabase.table('users').select('user_id', 'role').in_('user_id', [doctor_id, patient_id]).execute()
+        roles = {user['user_id']: user.get('role') for user in users_res.data or []}
+        
         # Check doctor
-        doc_res = supabase.table('users').select('user_id', 'role').eq('user_id', doctor_id).execute()
-        if not doc_res.data or len(doc_res.data) == 0:
+        if doctor_id not in roles:
              return jsonify({'error': f'Doctor with ID {doctor_id} not found'}), 404
-        if doc_res.data[0].get('role') != 'doctor':
+        if roles[doctor_id] != 'doctor':
              return jsonify({'error': f'User {doctor_id} is not a doctor'}), 400
              
         # Check patient
-        pat_res = supabase.table('users').select('user_id', 'role').eq('user_id', patient_id).execute()
-        if not pat_res.data or len(pat_res.data) == 0:
+        if patient_id not in roles:
              return jsonify({'error': f'Patient with ID {patient_id} not found'}), 404
-        if pat_res.data[0].get('role') != 'patient':
+        if roles[patient_id] != 'patient':
              return jsonify({'error': f'User {patient_id} is not a patient'}), 400
         
         # Check if key pair already exists
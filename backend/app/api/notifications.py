@@ -1,17 +1,28 @@
 # app/api/notifications.py
 from flask import Blueprint, request, jsonify
+import logging
 import os
+import threading
 from datetime import datetime
-from supabase import create_client
+from cachetools import TTLCache
+from app.utils.supabase_client import get_cached_client
+from app.utils.validators import is_uuid
 
 # Configuration
 SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY') or os.getenv('SUPABASE_SERVICE_KEY')
 
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase = get_cached_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+
+# Set up logger
+logger = logging.getLogger(__name__)
 
 notifications_bp = Blueprint('notifications', __name__, url_prefix='/api/notifications')
 
+# user_id/UUID -> UUID never changes for a live user; skip the users round trip on repeats
+_USER_UUID_CACHE = TTLCache(maxsize=1024, ttl=300)
+_user_uuid_cache_lock = threading.Lock()
+
 
 # ===== CORE NOTIFICATION CREATION FUNCTION =====
 def _create_notification_core(user_id, title, message, notification_type='info',
@@ -34,27 +45,14 @@ def _create_notification_core(user_id, title, message, notification_type='info',
         Created notification dict or None if failed
     """
     try:
-        # Find user's UUID from users table
-        user_result = supabase.table('users')\
-            .select('id')\
-            .eq('user_id', user_id)\
-            .limit(1)\
-            .execute()
-
-        if not user_result.data:
-            # If not found by user_id, try by id field (UUID)
-            user_result = supabase.table('users')\
-                .select('id')\
-                .eq('id', user_id)\
-                .limit(1)\
-                .execute()
+        # Find user's UUID from users table; notifications.user_id references users(id),
+        # so a UUID passed in directly is checked by the insert itself
+        user_uuid = _resolve_user_uuid(user_id, verify=False)
 
-        if not user_result.data:
-            print(f"[CORE] User not found: {user_id}")
+        if not user_uuid:
+            logger.warning("[CORE] User not found: %s", user_id)
             return None
 
-        user_uuid = user_result.data[0]['id']
-
         # Prepare notification data
         notification_data = {
             'user_id': user_uuid,
@@ -74,15 +72,13 @@ def _create_notification_core(user_id, title, message, notification_type='info',
             .execute()
 
         if not result.data:
-            print(f"[CORE] Failed to insert notification for {user_id}")
+            logger.warning("[CORE] Failed to insert notification for %s", user_id)
             return None
 
         return result.data[0]
 
     except Exception as e:
-        print(f"[CORE] Error creating notification: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("[CORE] Error creating notification: %s", e, exc_info=True)
         return None
 
 
@@ -102,29 +98,27 @@ def create_share_notification(file_data, shared_by, shared_with, access_level='r
         Created notification or None
     """
     try:
-        # Get sender details for friendly message
-        sender_result = supabase.table('users')\
-            .select('full_name')\
-            .eq('user_id', shared_by)\
-            .limit(1)\
+        # Get sender and recipient details in one round trip
+        users_result = supabase.table('users')\
+            .select('id, user_id, full_name')\
+            .in_('user_id', [shared_by, shared_with])\
             .execute()
+        users_by_id = {u['user_id']: u for u in users_result.data or []}
 
-        sender_name = "A user"
-        if sender_result.data:
-            sender_name = sender_result.data[0].get('full_name', shared_by)
+        # Both notifications for this share resolve these same users next; prime the resolver
+        with _user_uuid_cache_lock:
+            for user in users_by_id.values():
+                _USER_UUID_CACHE[user['user_id']] = user['id']
 
-        # Get recipient details
-        recipient_result = supabase.table('users')\
-            .select('id, full_name')\
-            .eq('user_id', shared_with)\
-            .limit(1)\
-            .execute()
+        sender_name = "A user"
+        if shared_by in users_by_id:
+            sender_name = users_by_id[shared_by].get('full_name', shared_by)
 
-        if not recipient_result.data:
-            print(f"[SHARE] Recipient {shared_with} not found in users table")
+        if shared_with not in users_by_id:
+            logger.warning("[SHARE] Recipient %s not found in users table", shared_with)
             return None
 
-        recipient_name = recipient_result.data[0].get('full_name', shared_with)
+        recipient_name = users_by_id[shared_with].get('full_name', shared_with)
 
         # Use the core function to create notification
         notification = _create_notification_core(
@@ -151,37 +145,63 @@ def create_share_notification(file_data, shared_by, shared_with, access_level='r
         )
 
         if not notification:
-            print(f"[SHARE] Failed to create share notification for {shared_with}")
+            logger.warning("[SHARE] Failed to create share notification for %s", shared_with)
 
         return notification
 
     except Exception as e:
-        print(f"[SHARE] Error creating share notification: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.error("[SHARE] Error creating share notification: %s", e, exc_info=True)
         return None
 
 
 # ===== Helper: resolve user_id or UUID → UUID =====
-def _resolve_user_uuid(user_identifier):
+def _resolve_user_uuid(user_identifier, verify=True):
     """
     Try user_id field first, then fall back to id (UUID).
     Returns the UUID string, or None if not found.
+
+    verify=False returns a UUID-shaped identifier as-is without querying users;
+    only for callers that write it into a column with a foreign key to users(id).
     """
-    user_result = supabase.table('users')\
-        .select('id')\
-        .eq('user_id', user_identifier)\
-        .limit(1)\
-        .execute()
+    with _user_uuid_cache_lock:
+        cached = _USER_UUID_CACHE.get(user_identifier)
+    if cached is not None:
+        return cached
 
-    if not user_result.data:
+    if not verify and is_uuid(user_identifier):
+        return user_identifier
+
+    if is_uuid(user_identifier):
+        # Either column could match; one round trip covers both, preferring a user_id hit
+        user_result = supabase.table('users')\
+            .select('id, user_id')\
+            .or_(f'user_id.eq.{user_identifier},id.eq.{user_identifier}')\
+            .limit(2)\
+            .execute()
+    else:
         user_result = supabase.table('users')\
             .select('id')\
-            .eq('id', user_identifier)\
+            .eq('user_id', user_identifier)\
             .limit(1)\
             .execute()
 
-    return user_result.data[0]['id'] if user_result.data else None
+    if not user_result.data:
+        return None
+
+    match = next((u for u in user_result.data if u.get('user_id') == user_identifier), user_result.data[0])
+    user_uuid = match['id']
+    with _user_uuid_cache_lock:
+        _USER_UUID_CACHE[user_identifier] = user_uuid
+    return user_uuid
+
+
+def invalidate_user_uuid_cache(user_identifier=None):
+    """Forget a resolved identifier, or every cached resolution when none is given"""
+    with _user_uuid_cache_lock:
+        if user_identifier is None:
+            _USER_UUID_CACHE.clear()
+        else:
+            _USER_UUID_CACHE.pop(user_identifier, None)
 
 
 # ===== GET all notifications for a user =====
@@ -212,7 +232,7 @@ def get_notifications():
             .execute()
 
         all_notifications = user_notifications.data or []
-        unread_count = len([n for n in all_notifications if not n['is_read']])
+        unread_count = sum(1 for n in all_notifications if not n['is_read'])
 
         return jsonify({
             'success': True,
@@ -222,7 +242,7 @@ def get_notifications():
         }), 200
 
     except Exception as e:
-        print(f"Error getting notifications: {e}")
+        logger.error("Error getting notifications: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -271,7 +291,7 @@ def create_notification():
             }), 500
 
     except Exception as e:
-        print(f"Error in create_notification endpoint: {str(e)}")
+        logger.error("Error in create_notification endpoint: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -306,7 +326,7 @@ def mark_notification_read(notification_id):
         }), 200
 
     except Exception as e:
-        print(f"Error marking notification as read: {e}")
+        logger.error("Error marking notification as read: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -343,7 +363,7 @@ def mark_all_read():
         }), 200
 
     except Exception as e:
-        print(f"Error marking all as read: {e}")
+        logger.error("Error marking all as read: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -375,7 +395,7 @@ def delete_notification(notification_id):
         }), 200
 
     except Exception as e:
-        print(f"Error deleting notification: {e}")
+        logger.error("Error deleting notification: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -408,7 +428,7 @@ def clear_all_notifications():
         }), 200
 
     except Exception as e:
-        print(f"Error clearing all notifications: {e}")
+        logger.error("Error clearing all notifications: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -429,7 +449,7 @@ def get_unread_count():
             }), 200
 
         result = supabase.table('notifications')\
-            .select('id', count='exact')\
+            .select('id', count='exact', head=True)\
             .eq('user_id', user_uuid)\
             .eq('is_read', False)\
             .execute()
@@ -442,7 +462,7 @@ def get_unread_count():
         }), 200
 
     except Exception as e:
-        print(f"Error getting unread count: {e}")
+        logger.error("Error getting unread count: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -472,11 +492,13 @@ def resolve_user():
         if not user_identifier:
             return jsonify({'error': 'user_id is required'}), 400
 
-        user_result = supabase.table('users')\
-            .select('id, user_id, full_name')\
-            .or_(f'user_id.eq.{user_identifier},id.eq.{user_identifier}')\
-            .limit(1)\
-            .execute()
+        user_query = supabase.table('users').select('id, user_id, full_name')
+        if is_uuid(user_identifier):
+            user_query = user_query.or_(f'user_id.eq.{user_identifier},id.eq.{user_identifier}')
+        else:
+            # A non-UUID value in an id filter would fail the whole query
+            user_query = user_query.eq('user_id', user_identifier)
+        user_result = user_query.limit(1).execute()
 
         if not user_result.data:
             return jsonify({'success': True, 'found': False, 'user': None}), 200
@@ -493,6 +515,5 @@ def resolve_user():
         }), 200
 
     except Exception as e:
-        import traceback
-        traceback.print_exc()
+        logger.error("Error resolving user: %s", e, exc_info=True)
         return jsonify({'error': str(e)}), 500
\ No newline at end of file
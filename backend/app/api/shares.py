@@ -1,5 +1,6 @@
 from flask import Blueprint, request, jsonify
-from supabase import create_client
+from app.utils.supabase_client import get_cached_client
+from app.utils.query_filters import contains_pattern, contains_match, pattern_is_exact
 import os
 from datetime import datetime, timezone
 import logging
@@ -12,7 +13,7 @@ SUPABASE_URL = os.getenv('SUPABASE_URL')
 SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_ROLE_KEY')
 if not SUPABASE_SERVICE_ROLE_KEY:
     SUPABASE_SERVICE_ROLE_KEY = os.getenv('SUPABASE_SERVICE_KEY')
-supabase = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
+supabase = get_cached_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
 # Blueprint for share routes
 shares_bp = Blueprint('shares', __name__, url_prefix='/api/shares')
@@ -49,6 +50,10 @@ def share_file():
         if access_level not in ['read', 'write']:
             return jsonify({'error': 'Invalid access level. Must be "read" or "write"'}), 400
         
+        # Check if trying to share with yourself
+        if shared_by == shared_with:
+            return jsonify({'error': 'Cannot share file with yourself'}), 400
+        
         # Verify file exists and user owns it
         file_check = supabase.table('encrypted_files')\
             .select('id, userid, owner_id, original_filename, file_size, file_extension')\
@@ -62,28 +67,14 @@ def share_file():
         
         file_data = file_check.data[0]
         
-        # Get sender's UUID if not provided
-        if not shared_by_uuid:
-            sender_query = supabase.table('users')\
-                .select('id')\
-                .eq('user_id', shared_by)\
-                .limit(1)\
-                .execute()
-            
-            if sender_query.data:
-                shared_by_uuid = sender_query.data[0]['id']
-                logger.debug(f"Found sender UUID for user_id: {shared_by}")
-            else:
-                logger.warning(f"Could not find sender UUID for user_id: {shared_by}")
-        
-        # Check if user owns the file
-        if shared_by_uuid and file_data['userid'] != shared_by_uuid:
+        # Check if user owns the file; the row carries both owner ids, so no users lookup is needed
+        if shared_by_uuid:
+            is_owner = file_data['userid'] == shared_by_uuid
+        else:
+            is_owner = file_data['owner_id'] == shared_by
+        if not is_owner:
             return jsonify({'error': 'You do not own this file'}), 403
         
-        # Check if trying to share with yourself
-        if shared_by == shared_with:
-            return jsonify({'error': 'Cannot share file with yourself'}), 400
-        
         # Check if already shared (active share)
         existing_share = supabase.table('file_shares')\
             .select('id')\
@@ -117,6 +108,10 @@ def share_file():
         
         logger.info(f"File shared: {file_id} from {shared_by} to {shared_with} (access: {access_level})")
         
+        # Listings of both sharer and recipient change; recipient is only known by user_id
+        from app.api.files import invalidate_files_cache
+        invalidate_files_cache()
+        
         # ===== CREATE NOTIFICATION FOR RECIPIENT =====
         notification_sent = False
         notification_id = None
@@ -260,9 +255,11 @@ def get_my_shares():
         
         # Get shares created by this user
         shares_query = supabase.table('file_shares')\
-            .select('*, encrypted_files(*)')\
+            .select('id, file_id, shared_with, access_level, shared_at, '
+                    'encrypted_files!inner(original_filename, file_size, file_extension)')\
             .eq('shared_by', user_id)\
             .eq('share_status', 'active')\
+            .eq('encrypted_files.is_deleted', False)\
             .order('shared_at', desc=True)\
             .range(start_idx, start_idx + limit - 1)
         
@@ -272,7 +269,7 @@ def get_my_shares():
         shares = []
         for share in shares_result.data:
             file_data = share.get('encrypted_files', {})
-            if file_data and not file_data.get('is_deleted'):
+            if file_data:
                 shares.append({
                     'share_id': share['id'],
                     'file_id': share['file_id'],
@@ -284,14 +281,19 @@ def get_my_shares():
                     'file_type': file_data.get('file_extension', '')
                 })
         
-        # Get total count
-        count_query = supabase.table('file_shares')\
-            .select('id', count='exact')\
-            .eq('shared_by', user_id)\
-            .eq('share_status', 'active')\
-            .execute()
-        
-        total_shares = count_query.count if hasattr(count_query, 'count') else len(shares)
+        # Get total count (a short, non-empty page already tells us where the list ends)
+        page_rows = len(shares_result.data)
+        if page_rows < limit and (page_rows or start_idx == 0):
+            total_shares = start_idx + page_rows
+        else:
+            count_query = supabase.table('file_shares')\
+                .select('id, encrypted_files!inner(id)', count='exact', head=True)\
+                .eq('shared_by', user_id)\
+                .eq('share_status', 'active')\
+                .eq('encrypted_files.is_deleted', False)\
+                .execute()
+            
+            total_shares = count_query.count if hasattr(count_query, 'count') else len(shares)
         
         return jsonify({
             'shares': shares,
@@ -319,7 +321,7 @@ def revoke_share(share_id):
         
         # Get the share to verify ownership
         share_check = supabase.table('file_shares')\
-            .select('*, encrypted_files!inner(owner_id)')\
+            .select('shared_by, encrypted_files!inner(owner_id)')\
             .eq('id', share_id)\
             .eq('share_status', 'active')\
             .execute()
@@ -345,6 +347,8 @@ def revoke_share(share_id):
         
         if result.data:
             logger.info(f"Share revoked: {share_id}")
+            from app.api.files import invalidate_files_cache
+            invalidate_files_cache()
             return jsonify({
                 'message': 'Share revoked successfully',
                 'share_id': share_id
@@ -377,11 +381,17 @@ def get_shared_with_me():
         # Calculate pagination
         start_idx = (page - 1) * limit
         
-        # Get active shares for this user
+        # Get active shares for this user; deleted/pending files are filtered in the join so pages stay full
         shares_query = supabase.table('file_shares')\
-            .select('*, encrypted_files(*)')\
+            .select('id, shared_by, shared_at, access_level, '
+                    'encrypted_files!inner(id, original_filename, file_size, uploaded_at, file_extension, '
+                    'owner_id, userid)')\
             .eq('shared_with', user_id)\
-            .eq('share_status', 'active')
+            .eq('share_status', 'active')\
+            .eq('encrypted_files.is_deleted', False)\
+            .eq('encrypted_files.upload_status', 'completed')
+        if search_query:
+            shares_query = shares_query.ilike('encrypted_files.original_filename', contains_pattern(search_query))
         
         # Apply sorting
         if sort_by == 'shared_at':
@@ -390,13 +400,23 @@ def get_shared_with_me():
             else:
                 shares_query = shares_query.order('shared_at', desc=True)
         
-        # Apply pagination
-        shares_query = shares_query.range(start_idx, start_idx + limit - 1)
+        # Apply pagination; a search ilike cannot express exactly is filtered and paged here instead
+        recheck_search = bool(search_query) and not pattern_is_exact(search_query)
+        if not recheck_search:
+            shares_query = shares_query.range(start_idx, start_idx + limit - 1)
         
         # Execute query
         shares_result = shares_query.execute()
-        
-        if not shares_result.data:
+        share_rows = shares_result.data or []
+        if recheck_search:
+            share_rows = [
+                share for share in share_rows
+                if contains_match((share.get('encrypted_files') or {}).get('original_filename'), search_query)
+            ]
+            matched_total = len(share_rows)
+            share_rows = share_rows[start_idx:start_idx + limit]
+        
+        if not share_rows:
             return jsonify({
                 'files': [],
                 'total': 0,
@@ -407,9 +427,9 @@ def get_shared_with_me():
         
         # Process the data
         files = []
-        for share in shares_result.data:
+        for share in share_rows:
             file_data = share['encrypted_files']
-            if file_data and not file_data.get('is_deleted') and file_data.get('upload_status') == 'completed':
+            if file_data:
                 files.append({
                     'id': file_data['id'],
                     'name': file_data['original_filename'],
@@ -425,24 +445,30 @@ def get_shared_with_me():
                     'share_id': share['id']
                 })
         
-        # Apply search filter if needed
-        if search_query:
-            files = [f for f in files if search_query.lower() in f['name'].lower()]
-        
         # Apply additional sorting
         if sort_by == 'name':
             files.sort(key=lambda x: x['name'].lower(), reverse=(sort_order == 'desc'))
         elif sort_by == 'size':
             files.sort(key=lambda x: x['size'], reverse=(sort_order == 'desc'))
         
-        # Get total count
-        count_query = supabase.table('file_shares')\
-            .select('id', count='exact')\
-            .eq('shared_with', user_id)\
-            .eq('share_status', 'active')\
-            .execute()
-        
-        total_files = count_query.count if hasattr(count_query, 'count') else len(files)
+        # Get total count (a short page already tells us where the list ends)
+        page_rows = len(share_rows)
+        if recheck_search:
+            total_files = matched_total
+        elif page_rows < limit:
+            total_files = start_idx + page_rows
+        else:
+            count_query = supabase.table('file_shares')\
+                .select('id, encrypted_files!inner(id)', count='exact', head=True)\
+                .eq('shared_with', user_id)\
+                .eq('share_status', 'active')\
+                .eq('encrypted_files.is_deleted', False)\
+                .eq('encrypted_files.upload_status', 'completed')
+            if search_query:
+                count_query = count_query.ilike('encrypted_files.original_filename', contains_pattern(search_query))
+            count_query = count_query.execute()
+            
+            total_files = count_query.count if hasattr(count_query, 'count') else len(files)
         
         return jsonify({
             'files': files,
@@ -503,7 +529,7 @@ def get_available_users():
                 .execute()
             
             if connections_query.data:
-                doctor_ids = [conn['doctor_id'] for conn in connections_query.data]
+                doctor_ids = list({conn['doctor_id'] for conn in connections_query.data})
                 
                 doctors_query = supabase.table('users')\
                     .select('user_id, full_name, email, role')\
@@ -529,7 +555,7 @@ def get_available_users():
                 .execute()
             
             if connections_query.data:
-                patient_ids = [conn['patient_id'] for conn in connections_query.data]
+                patient_ids = list({conn['patient_id'] for conn in connections_query.data})
                 
                 patients_query = supabase.table('users')\
                     .select('user_id, full_name, email, role')\
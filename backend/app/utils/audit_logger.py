@@ -3,7 +3,16 @@ Audit logging utility for tracking all system activities
 """
 from app.utils.supabase_client import get_supabase_admin_client
 from typing import Optional, Dict, Any
+import atexit
 import json
+import queue
+import threading
+import time
+
+# Auth events are sent by a background thread so the RPC round trip stays off the request
+_AUTH_EVENT_QUEUE = queue.Queue(maxsize=1000)
+_auth_event_worker = None
+_auth_event_worker_lock = threading.Lock()
 
 
 def log_audit(
@@ -49,6 +58,47 @@ def log_audit(
         return False
 
 
+def _send_auth_events():
+    while True:
+        supabase, params = _AUTH_EVENT_QUEUE.get()
+        try:
+            supabase.rpc('log_simple_auth_event', params).execute()
+        except Exception as e:
+            print(f"Failed to log auth event: {e}")
+        finally:
+            _AUTH_EVENT_QUEUE.task_done()
+
+
+def log_auth_event(supabase, params: Dict[str, Any]) -> None:
+    """
+    Queue a log_simple_auth_event call; returns without waiting for it.
+    Events are dropped (and reported) if the queue is full.
+    """
+    global _auth_event_worker
+    if _auth_event_worker is None:
+        with _auth_event_worker_lock:
+            if _auth_event_worker is None:
+                _auth_event_worker = threading.Thread(target=_send_auth_events, name='auth-event-logger', daemon=True)
+                _auth_event_worker.start()
+    try:
+        _AUTH_EVENT_QUEUE.put_nowait((supabase, params))
+    except queue.Full:
+        print(f"Auth event queue full, dropping {params.get('p_event_type')} event")
+
+
+def flush_auth_events(timeout: float = 5.0) -> bool:
+    """Wait up to timeout seconds for queued auth events to be sent"""
+    deadline = time.monotonic() + timeout
+    while _AUTH_EVENT_QUEUE.unfinished_tasks:
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.05)
+    return True
+
+
+atexit.register(flush_auth_events)
+
+
 # Convenience functions for common audit events
 
 def log_file_upload(user_id: str, filename: str, file_id: str, success: bool = True, error: Optional[str] = None):
@@ -6,6 +6,9 @@ import os
 import requests
 from flask import current_app
 
+# Reused across sends so OTP/reset emails keep the TLS connection to Brevo alive
+_brevo_session = requests.Session()
+
 
 def send_otp_email(recipient_email: str, otp_code: str, user_name: str = None) -> bool:
     """
@@ -107,7 +110,7 @@ def send_otp_via_brevo(recipient_email: str, otp_code: str, user_name: str, api_
             "htmlContent": html_body
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = _brevo_session.post(url, json=payload, headers=headers)
 
         if response.status_code == 201:
             print(f"SUCCESS: OTP email sent via Brevo to {recipient_email}")
@@ -173,7 +176,7 @@ def send_password_reset_email(recipient_email: str, reset_link: str, user_name:
             "htmlContent": html_body
         }
 
-        response = requests.post(url, json=payload, headers=headers)
+        response = _brevo_session.post(url, json=payload, headers=headers)
 
         if response.status_code == 201:
             print(f"SUCCESS: Password reset email sent via Brevo to {recipient_email}")
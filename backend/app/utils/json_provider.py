@@ -0,0 +1,25 @@
+"""
+orjson-backed JSON provider for Flask responses and request bodies
+"""
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+# Keep Flask's sorted keys and HTTP-date datetimes (rendered by Flask rather than orjson's
+# ISO output). Bodies are equivalent JSON but not identical bytes: orjson writes non-ASCII
+# as raw UTF-8 where Flask escaped it as \uXXXX.
+_DUMPS_OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serialize with orjson, deferring unsupported types to Flask's default handler"""
+
+    def dumps(self, obj, **kwargs):
+        # Flask asks for indent=2 in debug mode; orjson only indents by two spaces, so any
+        # indent gets that. Other json.dumps arguments are ignored.
+        option = _DUMPS_OPTIONS
+        if kwargs.get('indent'):
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode()
+
+    def loads(self, s, **kwargs):
+        return orjson.loads(s)
@@ -0,0 +1,88 @@
+"""
+Pending OTP storage, keyed by email with automatic expiry
+"""
+import hmac
+import json
+import threading
+from cachetools import TTLCache
+from app.utils.redis_client import get_redis_client
+
+OTP_TTL_SECONDS = 600
+
+
+class MemoryOtpStore:
+    """Per-process store; fine for a single worker or local development"""
+
+    def __init__(self, ttl=OTP_TTL_SECONDS, maxsize=10000):
+        self._entries = TTLCache(maxsize=maxsize, ttl=ttl)
+        self._lock = threading.Lock()
+
+    def set(self, email: str, entry: dict) -> None:
+        with self._lock:
+            self._entries[email] = entry
+
+    def get(self, email: str):
+        with self._lock:
+            return self._entries.get(email)
+
+    def consume(self, email: str, code: str):
+        with self._lock:
+            entry = self._entries.get(email)
+            if entry is None or not hmac.compare_digest(entry['code'].encode(), code.encode()):
+                return None
+            del self._entries[email]
+            return entry
+
+
+# Delete and return the entry only if its code matches, in one step, so two workers
+# cannot both accept the same code
+_CONSUME_LUA = """
+local raw = redis.call('GET', KEYS[1])
+if not raw or cjson.decode(raw)['code'] ~= ARGV[1] then
+    return false
+end
+redis.call('DEL', KEYS[1])
+return raw
+"""
+
+
+class RedisOtpStore:
+    """Redis-backed store shared by every worker; Redis expires entries itself"""
+
+    def __init__(self, redis_client, ttl=OTP_TTL_SECONDS):
+        self._redis = redis_client
+        self._ttl = ttl
+        self._consume = redis_client.register_script(_CONSUME_LUA)
+
+    @staticmethod
+    def _key(email: str) -> str:
+        return f"otp:{email}"
+
+    def set(self, email: str, entry: dict) -> None:
+        self._redis.setex(self._key(email), self._ttl, json.dumps(entry))
+
+    def get(self, email: str):
+        raw = self._redis.get(self._key(email))
+        return json.loads(raw) if raw else None
+
+    def consume(self, email: str, code: str):
+        raw = self._consume(keys=[self._key(email)], args=[code])
+        return json.loads(raw) if raw else None
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_otp_store():
+    """
+    Return the shared OTP store, creating it on first use.
+    Uses Redis when REDIS_URL is set, otherwise an in-process store.
+    """
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                redis_client = get_redis_client()
+                _store = RedisOtpStore(redis_client) if redis_client is not None else MemoryOtpStore()
+    return _store
@@ -0,0 +1,24 @@
+"""
+Helpers for building PostgREST filter values
+"""
+
+
+def contains_pattern(term: str) -> str:
+    """
+    Build an ilike pattern matching rows whose value contains term, ignoring case.
+    PostgREST turns '*' into '%' and offers no escape for it, so each '*' is sent as
+    '_' (any one character); the pattern is then only exact when pattern_is_exact(term),
+    and callers must recheck other rows with contains_match.
+    """
+    escaped = term.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_').replace('*', '_')
+    return f'%{escaped}%'
+
+
+def pattern_is_exact(term: str) -> bool:
+    """Whether contains_pattern(term) matches exactly the rows containing term"""
+    return '*' not in term
+
+
+def contains_match(value, term: str) -> bool:
+    """The check contains_pattern stands for, applied in Python"""
+    return term.lower() in (value or '').lower()
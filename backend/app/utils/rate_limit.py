@@ -0,0 +1,116 @@
+"""
+Sliding-window rate limiting for auth endpoints
+"""
+import logging
+import secrets
+import threading
+import time
+from collections import deque
+from functools import wraps
+from cachetools import TTLCache
+from flask import request, jsonify
+from app.utils.redis_client import get_redis_client
+
+logger = logging.getLogger(__name__)
+
+# Drop hits older than the window, then admit and record this one only if under the limit
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local now = tonumber(ARGV[1])
+local window = tonumber(ARGV[2])
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) >= tonumber(ARGV[3]) then
+    return 1
+end
+redis.call('ZADD', key, now, ARGV[4])
+redis.call('PEXPIRE', key, window)
+return 0
+"""
+
+_limiters = []
+
+
+def reset_rate_limits() -> None:
+    """Forget every in-process hit count; tests call this between cases"""
+    for limiter in _limiters:
+        limiter.reset()
+
+
+class SlidingWindowLimiter:
+    """
+    Allows at most `limit` hits per key in any `window` seconds.
+    Counts are shared through Redis when REDIS_URL is set, otherwise kept per process.
+    """
+
+    def __init__(self, scope: str, limit: int, window: int):
+        self.scope = scope
+        self.limit = limit
+        self.window = window
+        self._hits = TTLCache(maxsize=10000, ttl=window)
+        self._lock = threading.Lock()
+        self._script = None
+        _limiters.append(self)
+
+    def _allow_redis(self, redis_client, key: str) -> bool:
+        if self._script is None:
+            self._script = redis_client.register_script(_SLIDING_WINDOW_LUA)
+        now_ms = int(time.time() * 1000)
+        member = f"{now_ms}-{secrets.token_hex(4)}"
+        limited = self._script(keys=[f"ratelimit:{self.scope}:{key}"],
+                               args=[now_ms, self.window * 1000, self.limit, member])
+        return not limited
+
+    def _allow_local(self, key: str) -> bool:
+        now = time.monotonic()
+        with self._lock:
+            hits = self._hits.get(key) or deque()
+            while hits and hits[0] <= now - self.window:
+                hits.popleft()
+            if len(hits) >= self.limit:
+                return False
+            hits.append(now)
+            self._hits[key] = hits
+        return True
+
+    def reset(self) -> None:
+        with self._lock:
+            self._hits.clear()
+
+    def allow(self, key: str) -> bool:
+        redis_client = get_redis_client()
+        if redis_client is None:
+            return self._allow_local(key)
+        try:
+            return self._allow_redis(redis_client, key)
+        except Exception as e:
+            # Fail open: an unreachable Redis should not lock everyone out
+            logger.warning("Rate limiter for %s unavailable, allowing request: %s", self.scope, e)
+            return True
+
+
+def rate_limit(scope: str, limit: int, window: int, identity_field: str = None):
+    """
+    Decorator: reject with 429 once a client exceeds `limit` requests in `window` seconds.
+    Clients are keyed by remote address plus `identity_field` from the JSON body, if given.
+    """
+    limiter = SlidingWindowLimiter(scope, limit, window)
+
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            key = request.remote_addr or 'unknown'
+            if identity_field:
+                data = request.get_json(silent=True) or {}
+                key = f"{key}:{data.get(identity_field) or ''}"
+
+            if not limiter.allow(key):
+                response = jsonify({
+                    'success': False,
+                    'message': 'Too many attempts. Please try again later.'
+                })
+                response.headers['Retry-After'] = str(window)
+                return response, 429
+
+            return f(*args, **kwargs)
+        return decorated_function
+    return decorator
@@ -0,0 +1,26 @@
+"""
+Optional shared Redis client, enabled by setting REDIS_URL
+"""
+import os
+import threading
+
+_client = None
+_client_loaded = False
+_client_lock = threading.Lock()
+
+
+def get_redis_client():
+    """
+    Return the shared Redis client, or None when REDIS_URL is not set.
+    The client keeps its own connection pool, so build it once and reuse it.
+    """
+    global _client, _client_loaded
+    if not _client_loaded:
+        with _client_lock:
+            if not _client_loaded:
+                redis_url = os.environ.get('REDIS_URL')
+                if redis_url:
+                    import redis
+                    _client = redis.Redis(connection_pool=redis.ConnectionPool.from_url(redis_url))
+                _client_loaded = True
+    return _client
@@ -1,12 +1,48 @@
 """
 Supabase client utility for database operations
 """
-from supabase import create_client, Client
+import threading
+import httpx
+from supabase import create_client, Client, ClientOptions
 from flask import current_app
 
+# Clients keep their own HTTP connection pools, so build one per (url, key) and reuse it
+_clients = {}
+_clients_lock = threading.Lock()
+
+# Pool sized above the files query pool (8 workers) plus request threads. Keep-alive and
+# HTTP/2 let consecutive queries reuse one TLS connection. The 120s read timeout matches
+# supabase-py's PostgREST default and leaves room for 50MB storage uploads.
+_HTTP_LIMITS = httpx.Limits(max_keepalive_connections=20, max_connections=50, keepalive_expiry=30.0)
+_HTTP_TIMEOUT = httpx.Timeout(120.0, connect=10.0)
+
+def get_cached_client(supabase_url: str, supabase_key: str) -> Client:
+    """
+    Return the shared client for these credentials, creating it on first use.
+    Usable outside an app context, e.g. by blueprint modules at import time.
+    """
+    client = _clients.get((supabase_url, supabase_key))
+    if client is None:
+        with _clients_lock:
+            client = _clients.get((supabase_url, supabase_key))
+            if client is None:
+                http_client = httpx.Client(
+                    limits=_HTTP_LIMITS,
+                    timeout=_HTTP_TIMEOUT,
+                    http2=True,
+                    follow_redirects=True,
+                )
+                client = create_client(
+                    supabase_url,
+                    supabase_key,
+                    options=ClientOptions(httpx_client=http_client),
+                )
+                _clients[(supabase_url, supabase_key)] = client
+    return client
+
 def get_supabase_client() -> Client:
     """
-    Create and return a Supabase client instance
+    Return a Supabase client instance
     """
     supabase_url = current_app.config['SUPABASE_URL']
     supabase_key = current_app.config['SUPABASE_KEY']
@@ -14,11 +50,11 @@ def get_supabase_client() -> Client:
     if not supabase_url or not supabase_key:
         raise ValueError("Supabase URL and Key must be configured")
 
-    return create_client(supabase_url, supabase_key)
+    return get_cached_client(supabase_url, supabase_key)
 
 def get_supabase_admin_client() -> Client:
     """
-    Create and return a Supabase client with service role key (admin access)
+    Return a Supabase client with service role key (admin access)
     """
     supabase_url = current_app.config['SUPABASE_URL']
     supabase_service_key = current_app.config['SUPABASE_SERVICE_KEY']
@@ -26,4 +62,4 @@ def get_supabase_admin_client() -> Client:
     if not supabase_url or not supabase_service_key:
         raise ValueError("Supabase URL and Service Key must be configured")
 
-    return create_client(supabase_url, supabase_service_key)
+    return get_cached_client(supabase_url, supabase_service_key)
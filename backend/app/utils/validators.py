@@ -0,0 +1,20 @@
+"""
+Shared input checks for identifiers received by the API
+"""
+import re
+
+_UUID_RE = re.compile(r'[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}', re.I)
+
+
+def is_uuid(value) -> bool:
+    """
+    True for a canonical hyphenated UUID string.
+    The length and hyphen checks reject text ids like 'JYDOC-67F' without running
+    the regex; the full match guarantees hex digits, so a True value is also safe
+    to embed in a PostgREST filter string.
+    """
+    return (
+        isinstance(value, str) and len(value) == 36
+        and value[8] == '-' and value[13] == '-' and value[18] == '-' and value[23] == '-'
+        and _UUID_RE.fullmatch(value) is not None
+    )
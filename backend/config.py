@@ -22,6 +22,9 @@ class Config:
     # Security
     MASTER_KEY = os.environ.get('MASTER_KEY')
 
+    # Number of reverse proxies in front of the app; X-Forwarded-* is trusted only this many hops deep
+    PROXY_FIX_HOPS = int(os.environ.get('PROXY_FIX_HOPS', '1'))
+
     # Email configuration
     SMTP_HOST = os.environ.get('SMTP_HOST', 'smtp.gmail.com')
     SMTP_PORT = int(os.environ.get('SMTP_PORT', '587'))
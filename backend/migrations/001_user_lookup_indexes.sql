@@ -0,0 +1,13 @@
+-- Indexes for user identifier lookups.
+--
+-- Nearly every endpoint resolves a text user_id (e.g. 'JYDOC-67F') to its
+-- users row, and file_shares rows reference users by that same text id.
+-- users.id is the primary key and already indexed.
+--
+-- CONCURRENTLY avoids locking users while the index builds; run this file
+-- outside a transaction (e.g. paste into the Supabase SQL editor as-is).
+-- If user_id already carries a UNIQUE constraint, its index covers this and
+-- the statement below is redundant but harmless.
+
+CREATE INDEX CONCURRENTLY IF NOT EXISTS users_user_id_idx
+    ON public.users (user_id);
@@ -1,5 +1,25 @@
 import pytest
 from unittest.mock import MagicMock
+from app import create_app
+from app.utils.rate_limit import reset_rate_limits
+from tests.fakes import InMemoryKeyPairStore
+
+@pytest.fixture(scope="session")
+def app():
+    """One app for the whole session; tests only need a fresh client each"""
+    app = create_app()
+    app.config.update({
+        "TESTING": True,
+        "SUPABASE_URL": "https://dummy.supabase.co",
+        "SUPABASE_KEY": "dummy",
+        "SUPABASE_SERVICE_KEY": "dummy",
+    })
+    return app
+
+@pytest.fixture
+def client(app):
+    with app.test_client() as client:
+        yield client
 
 @pytest.fixture(autouse=True)
 def mock_supabase_admin(monkeypatch):
@@ -7,3 +27,33 @@ def mock_supabase_admin(monkeypatch):
         "app.utils.supabase_client.get_supabase_admin_client",
         lambda: MagicMock()
     )
+    # audit_logger binds the function at import; key endpoints log through it
+    monkeypatch.setattr(
+        "app.utils.audit_logger.get_supabase_admin_client",
+        lambda: MagicMock()
+    )
+
+@pytest.fixture(autouse=True)
+def rate_limits():
+    """Limiters live for the whole session; start every test with a clean count"""
+    reset_rate_limits()
+    yield
+    reset_rate_limits()
+
+@pytest.fixture(autouse=True)
+def key_pair_store(monkeypatch):
+    """Keep key pairs in memory so no test reaches the Supabase-backed store"""
+    store = InMemoryKeyPairStore()
+    # Blueprints bind the store at import, so replace every reference to it
+    monkeypatch.setattr("app.models.storage.key_pair_store", store)
+    monkeypatch.setattr("app.api.keys.key_pair_store", store)
+    monkeypatch.setattr("app.api.files.key_pair_store", store)
+    return store
+
+@pytest.fixture(scope="session")
+def encrypted_dek():
+    """A real DEK wrapped with the master key, computed once per test session"""
+    from app.crypto.encryption import EncryptionManager
+    from config import Config
+    key_b64 = EncryptionManager.key_to_base64(EncryptionManager.generate_key())
+    return EncryptionManager.encrypt_dek(key_b64, Config.MASTER_KEY)
@@ -0,0 +1,40 @@
+"""
+In-memory stand-ins for the Supabase-backed stores
+"""
+from typing import Dict, List, Optional
+from app.models.encryption_models import KeyPair
+
+
+class InMemoryKeyPairStore:
+    """Dict-backed KeyPairStore with the same interface, for tests"""
+
+    def __init__(self):
+        self.key_pairs: Dict[str, KeyPair] = {}
+
+    def create(self, key_pair: KeyPair) -> KeyPair:
+        self.key_pairs[key_pair.key_id] = key_pair
+        return key_pair
+
+    def get(self, key_id: str) -> Optional[KeyPair]:
+        return self.key_pairs.get(key_id)
+
+    def get_by_users(self, doctor_id: str, patient_id: str) -> Optional[KeyPair]:
+        for kp in self.key_pairs.values():
+            if kp.doctor_id == doctor_id and kp.patient_id == patient_id and kp.status == 'Active':
+                return kp
+        return None
+
+    def list_all(self) -> List[KeyPair]:
+        return list(self.key_pairs.values())
+
+    def list_by_user(self, user_id: str) -> List[KeyPair]:
+        return [kp for kp in self.key_pairs.values() if user_id in (kp.doctor_id, kp.patient_id)]
+
+    def update_status(self, key_id: str, status: str) -> Optional[KeyPair]:
+        kp = self.key_pairs.get(key_id)
+        if kp:
+            kp.status = status
+        return kp
+
+    def delete(self, key_id: str) -> bool:
+        return self.key_pairs.pop(key_id, None) is not None
@@ -0,0 +1,42 @@
+import pytest
+
+VALID_LOGIN = {
+    'role': 'doctor',
+    'userId': 'JYDOC-67F',
+    'password': 'irrelevant',
+    'nric': 'S1234567A'
+}
+
+# Each case breaks one field; validation must reject it before any user lookup
+SANITIZATION_CASES = [
+    ('role', "doctor' OR '1'='1", 'Invalid role format'),
+    ('userId', "JYDOC-67F'; DROP TABLE users;--", 'Invalid User ID format'),
+    ('nric', 'S1234567A OR 1=1', 'Invalid NRIC format'),
+]
+
+@pytest.mark.parametrize('field, value, expected_message', SANITIZATION_CASES, ids=[c[0] for c in SANITIZATION_CASES])
+def test_login_rejects_malformed_input(client, field, value, expected_message):
+    payload = dict(VALID_LOGIN, **{field: value})
+
+    response = client.post('/api/auth/login', json=payload)
+
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': expected_message}
+
+@pytest.mark.parametrize('code', ['１２３４５６', '12345', '12a456', 123456], ids=['full-width', 'short', 'letters', 'number'])
+def test_verify_code_rejects_malformed_code(client, code):
+    response = client.post('/api/auth/verify-code', json={'email': 'user@example.com', 'code': code})
+
+    assert response.status_code == 400
+    assert response.get_json() == {'success': False, 'message': 'Invalid verification code format'}
+
+def test_verify_code_rate_limited_per_email(client):
+    payload = {'email': 'user@example.com', 'code': 'bad'}
+    for _ in range(5):
+        assert client.post('/api/auth/verify-code', json=payload).status_code == 400
+
+    response = client.post('/api/auth/verify-code', json=payload)
+
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == '60'
+    assert response.get_json() == {'success': False, 'message': 'Too many attempts. Please try again later.'}
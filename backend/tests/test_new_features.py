@@ -1,49 +1,31 @@
 import pytest
 import json
 from unittest.mock import patch, MagicMock
-from app import create_app
 from app.models.encryption_models import KeyPair
-from app.crypto.encryption import EncryptionManager
 
 @pytest.fixture
-def client():
-    app = create_app()
-    app.config['TESTING'] = True
-    # We validly utilize the test client here
-    with app.test_client() as client:
-        yield client
-
-@pytest.fixture
-def mock_key_pair():
+def mock_key_pair(encrypted_dek):
     """Create a mock KeyPair object in memory (no DB calls)"""
     key_id = "key_test_mock_123"
     
-    # Generate a real key for crypto validity
-    key = EncryptionManager.generate_key()
-    key_b64 = EncryptionManager.key_to_base64(key)
-    
-    from config import Config
-    # We still rely on Config.MASTER_KEY for logic, assuming it's in env or default
-    encrypted_key = EncryptionManager.encrypt_dek(key_b64, Config.MASTER_KEY)
-
+    # Real wrapped DEK for crypto validity, shared across the session
     kp = KeyPair(
         key_id=key_id,
         doctor_id="DR001",
         patient_id="PT001",
-        encryption_key=encrypted_key,
+        encryption_key=encrypted_dek,
         status="Active"
     )
     # DO NOT Save to DB here
     return kp
 
 @patch('app.api.keys.audit_logger', create=True)
-@patch('app.api.keys.key_pair_store')
 @patch('app.utils.supabase_client.get_supabase_admin_client')
-def test_scan_qr_code_success(mock_get_supabase, mock_store, mock_audit, client, mock_key_pair):
-    """Test successful QR code scanning directly mocking the store"""
+def test_scan_qr_code_success(mock_get_supabase, mock_audit, client, mock_key_pair, key_pair_store):
+    """Test successful QR code scanning against the in-memory store"""
     
-    # Setup Mocks
-    mock_store.get.return_value = mock_key_pair
+    # Setup store and mocks
+    key_pair_store.create(mock_key_pair)
     
     # Mock Supabase insert for connection record
     mock_supabase_instance = MagicMock()
@@ -65,9 +47,6 @@ def test_scan_qr_code_success(mock_get_supabase, mock_store, mock_audit, client,
     data = response.get_json()
     assert data['success'] is True
     assert data['connection']['key_id'] == mock_key_pair.key_id
-    
-    # Verify store was called
-    mock_store.get.assert_called_with(mock_key_pair.key_id)
 
 def test_scan_qr_code_invalid_data(client):
     """Test QR scan with invalid data (No mocks needed for validation failure)"""
@@ -84,12 +63,11 @@ def test_scan_qr_code_invalid_data(client):
     assert response.status_code == 400
     assert 'Incomplete QR code data' in response.get_json()['error']
 
-@patch('app.api.keys.key_pair_store')
-def test_scan_qr_code_mismatch(mock_store, client, mock_key_pair):
+def test_scan_qr_code_mismatch(client, mock_key_pair, key_pair_store):
     """Test QR scan with matching key ID but wrong user IDs"""
     
-    # Setup Mock
-    mock_store.get.return_value = mock_key_pair
+    # Setup store
+    key_pair_store.create(mock_key_pair)
     
     qr_data = {
         'key_id': mock_key_pair.key_id,
@@ -0,0 +1,18 @@
+from app.utils.otp_store import MemoryOtpStore
+
+def test_memory_store_consume_is_single_use():
+    store = MemoryOtpStore()
+    store.set('user@example.com', {'code': '123456', 'user': {'id': 'u1'}})
+
+    assert store.consume('user@example.com', '654321') is None
+    assert store.get('user@example.com') is not None
+
+    entry = store.consume('user@example.com', '123456')
+    assert entry == {'code': '123456', 'user': {'id': 'u1'}}
+
+    # A replay of the right code finds nothing left to consume
+    assert store.consume('user@example.com', '123456') is None
+    assert store.get('user@example.com') is None
+
+def test_memory_store_consume_unknown_email():
+    assert MemoryOtpStore().consume('nobody@example.com', '123456') is None
@@ -0,0 +1,56 @@
+import hashlib
+from unittest.mock import patch, MagicMock
+from app.api.auth import hash_password, verify_password, is_legacy_password_hash
+
+LOGIN = {
+    'role': 'doctor',
+    'userId': 'JYDOC-67F',
+    'password': 'correct horse',
+    'nric': 'S1234567A'
+}
+
+def test_bcrypt_hash_verifies():
+    stored = hash_password('correct horse')
+
+    assert not is_legacy_password_hash(stored)
+    assert verify_password('correct horse', stored)
+    assert not verify_password('wrong horse', stored)
+
+def test_legacy_sha256_hash_verifies():
+    stored = hashlib.sha256(b'correct horse').hexdigest()
+
+    assert is_legacy_password_hash(stored)
+    assert verify_password('correct horse', stored)
+    assert not verify_password('wrong horse', stored)
+
+def test_empty_hash_is_rejected():
+    assert not verify_password('', '')
+    assert not verify_password('correct horse', None)
+
+@patch('app.api.auth.send_otp_for_user')
+@patch('app.api.auth.get_supabase_admin_client')
+def test_login_upgrades_legacy_hash(mock_get_supabase, mock_send_otp, client):
+    supabase = MagicMock()
+    mock_get_supabase.return_value = supabase
+    users = supabase.table.return_value
+    users.select.return_value.eq.return_value.eq.return_value.eq.return_value.limit.return_value\
+        .execute.return_value = MagicMock(data=[{
+            'id': 'u1',
+            'user_id': 'JYDOC-67F',
+            'email': 'doc@example.com',
+            'full_name': 'Dr Test',
+            'role': 'doctor',
+            'is_active': True,
+            'password_hash': hashlib.sha256(b'correct horse').hexdigest(),
+            'password_reset_required': False
+        }])
+
+    response = client.post('/api/auth/login', json=LOGIN)
+
+    assert response.status_code == 200
+    users.update.assert_called_once()
+    upgraded = users.update.call_args.args[0]['password_hash']
+    assert not is_legacy_password_hash(upgraded)
+    assert verify_password('correct horse', upgraded)
+    users.update.return_value.eq.assert_called_once_with('id', 'u1')
+    mock_send_otp.assert_called_once()
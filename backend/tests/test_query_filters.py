@@ -0,0 +1,13 @@
+from app.utils.query_filters import contains_pattern, contains_match, pattern_is_exact
+
+def test_contains_pattern_escapes_like_wildcards():
+    assert contains_pattern('50%_off\\') == '%50\\%\\_off\\\\%'
+
+def test_star_is_narrowed_and_rechecked():
+    # PostgREST would read '*' as '%', so it is sent as a single-character wildcard
+    assert contains_pattern('a*b') == '%a_b%'
+    assert not pattern_is_exact('a*b')
+    assert pattern_is_exact('a_b')
+    assert contains_match('Scan A*B.pdf', 'a*b')
+    assert not contains_match('Scan AxB.pdf', 'a*b')
+    assert not contains_match(None, 'a*b')